@@ -0,0 +1,239 @@
+# batch simulation: steps lots of independent players at once, with numpy
+#   for trying out thousands of launches (or ghost runs) quickly, ex: for tuning
+#   gives the same results as physics.Player.updatePosition on each player by itself
+#   (to within floating point rounding, well under 1e-9 pixels)
+#   the arrays only handle boxes, so circle/polygon players or platforms (see
+#   colliders.py) get stepped one at a time instead, same as without numpy
+
+import types
+import physics
+import colliders
+
+# numpy is optional: without it every player is just stepped one at a time
+try: import numpy as np
+except ModuleNotFoundError: np = None
+
+def isAllBoxes(platforms):
+    return all(colliders.isBox(platform.getCollider()) for platform in platforms)
+
+def getPlatformBoxes(platforms):
+    # (left, top, right, bottom) arrays of a list of objects (or a PlatformStore)
+    boxes = [physics.getBox(platform) for platform in platforms]
+    return [np.array([box[side] for box in boxes], dtype = float) for side in range(4)]
+
+class PlayerBatch:
+    # count players with the same size and constants as template (a physics.Player),
+    # stored as arrays of x, y, vx and vy (one entry per player)
+
+    def __init__(self, template, positions, velocities = None):
+        self.template = template
+        self.size = template.getSize()
+        if velocities is None:
+            velocities = [(0,0)]*len(positions)
+
+        collider = template.getCollider()
+        self.players = None # only used without numpy (or for shapes other than boxes)
+        if np is None or not colliders.isBox(collider) or collider.width != collider.height:
+            self.makePlayers(positions, velocities)
+            return
+
+        self.x = np.array([pos[0] for pos in positions], dtype = float)
+        self.y = np.array([pos[1] for pos in positions], dtype = float)
+        self.vx = np.array([velocity[0] for velocity in velocities], dtype = float)
+        self.vy = np.array([velocity[1] for velocity in velocities], dtype = float)
+        # Player's sleep state (all awake to start, like after setVelocity)
+        self.sleeping = np.zeros(len(self.x), dtype = bool)
+        self.stillTicks = np.zeros(len(self.x), dtype = int)
+
+    def makePlayers(self, positions, velocities, sleeping = None, stillTicks = None):
+        # switches to one physics.Player per player
+        template = self.template
+        self.players = []
+        for i, (pos, velocity) in enumerate(zip(positions, velocities)):
+            player = physics.Player(pos, self.size)
+            player.__dict__.update({key: value for key, value in template.__dict__.items()
+                                    if key not in ("x", "y", "vx", "vy")})
+            player.setVelocity(velocity)
+            if sleeping is not None:
+                player.sleeping, player.stillTicks = bool(sleeping[i]), int(stillTicks[i])
+            self.players.append(player)
+
+    def __len__(self):
+        if self.players is not None:
+            return len(self.players)
+        return len(self.x)
+
+    def getPositions(self):
+        if self.players is not None:
+            return [player.getPosition() for player in self.players]
+        return list(zip(self.x.tolist(), self.y.tolist()))
+
+    def getVelocities(self):
+        if self.players is not None:
+            return [player.getVelocity() for player in self.players]
+        return list(zip(self.vx.tolist(), self.vy.tolist()))
+
+    def run(self, platforms, steps, dt = physics.TICK):
+        platforms = list(platforms)
+        if self.players is None and not isAllBoxes(platforms):
+            self.makePlayers(self.getPositions(), self.getVelocities(),
+                             self.sleeping, self.stillTicks)
+        boxes = None if self.players is not None else getPlatformBoxes(platforms)
+        for _ in range(steps):
+            self.step(platforms, dt, boxes)
+
+    def step(self, platforms, dt = physics.TICK, boxes = None):
+        # one Player.updatePosition for every player
+        # (boxes can be passed in to skip converting the platforms every step)
+        if self.players is None and boxes is None and not isAllBoxes(platforms):
+            self.makePlayers(self.getPositions(), self.getVelocities(),
+                             self.sleeping, self.stillTicks)
+        if self.players is not None:
+            app = types.SimpleNamespace(objects = list(platforms))
+            for player in self.players:
+                player.updatePosition(app, dt)
+            return
+
+        template = self.template
+        if boxes is None:
+            boxes = getPlatformBoxes(platforms)
+
+        # sleeping players don't move, so they're put back where they were afterwards
+        sleeping = self.sleeping.copy()
+        if sleeping.any():
+            x, y = self.x[sleeping], self.y[sleeping]
+
+        # gravity, same as Player.updatePosition
+        self.vx += template.ax*dt
+        terminal = template.terminalVelocity
+        self.vy = np.where(self.vy < terminal,
+                           np.minimum(self.vy + template.gravity*dt, terminal), self.vy)
+
+        if len(boxes[0]) == 0:
+            self.x += self.vx*dt
+            self.y += self.vy*dt
+            return
+
+        self.moveAndCollide(boxes, dt)
+        self.objectCollisionUpdate(boxes, dt)
+        if sleeping.any():
+            self.x[sleeping], self.y[sleeping] = x, y
+            self.vx[sleeping] = self.vy[sleeping] = 0
+        self.updateSleep(boxes)
+
+    def updateSleep(self, boxes):
+        # Player.updateSleep for every player
+        template = self.template
+        left, top, right, bottom = [side[None,:] for side in boxes]
+        x, y = self.x[:,None], self.y[:,None]
+        supported = ((np.abs(top - y) < 1) & (x < right) & (x + self.size > left)).any(axis = 1)
+        still = (np.abs(self.vx) < template.sleepSpeed) & (np.abs(self.vy) < template.sleepSpeed)
+        self.stillTicks = np.where(still & supported & ~self.sleeping, self.stillTicks + 1, 0)
+        asleep = self.stillTicks >= template.sleepTicks
+        self.sleeping |= asleep
+        self.vx[asleep] = self.vy[asleep] = 0
+
+    def bounce(self, mask, normalx, normaly, dt):
+        # Player.bounce for the players in mask
+        template = self.template
+        vx, vy = self.vx[mask], self.vy[mask]
+        collisionspeed = vx*normalx + vy*normaly
+
+        collisionx = normalx*collisionspeed
+        collisiony = normaly*collisionspeed
+
+        tangentx = vx - collisionx
+        tangenty = vy - collisiony
+
+        friction = template.getFriction(dt)
+        self.vx[mask] = vx - collisionx*(1+template.collisionElasticity) - tangentx*friction
+        self.vy[mask] = vy - collisiony*(1+template.collisionElasticity) - tangenty*friction
+
+    def moveAndCollide(self, boxes, dt, maxHits = 3):
+        # Player.moveAndCollide, with every player against every platform at once
+        # (arrays are players x platforms, and only the players still moving are kept)
+        otherLeft, otherTop, otherRight, otherBottom = [side[None,:] for side in boxes]
+        moving = np.arange(len(self.x)) # indices of the players that haven't finished moving
+        remaining = np.ones(len(self.x))
+
+        for _ in range(maxHits):
+            x, y = self.x[moving], self.y[moving]
+            dx = self.vx[moving]*dt*remaining
+            dy = self.vy[moving]*dt*remaining
+
+            xEntry, xExit, xNever = getAxisTimes(x, x + self.size, otherLeft, otherRight, dx)
+            yEntry, yExit, yNever = getAxisTimes(y - self.size, y, otherTop, otherBottom, dy)
+
+            entry = np.maximum(xEntry, yEntry)
+            exit = np.minimum(xExit, yExit)
+            hits = ~xNever & ~yNever & (entry < exit) & (entry >= -1e-9) & (entry <= 1)
+
+            # first platform hit by each player (first in order if there's a tie)
+            entry = np.where(hits, entry, np.inf)
+            first = np.argmin(entry, axis = 1)
+            rows = np.arange(len(moving))
+            hit = hits[rows, first]
+
+            # players that don't hit anything just move the whole way
+            missed = ~hit
+            self.x[moving[missed]] = x[missed] + dx[missed]
+            self.y[moving[missed]] = y[missed] + dy[missed]
+            if not hit.any():
+                return
+
+            # move up to the platform, then bounce off it
+            timeOfImpact = np.maximum(0, entry[rows, first])[hit]
+            xSide = (xEntry[rows, first] > yEntry[rows, first])[hit]
+            dx, dy = dx[hit], dy[hit]
+            normalx = np.where(xSide, np.where(dx > 0, -1, 1), 0)
+            normaly = np.where(xSide, 0, np.where(dy > 0, -1, 1))
+
+            moving = moving[hit]
+            self.x[moving] = x[hit] + dx*timeOfImpact
+            self.y[moving] = y[hit] + dy*timeOfImpact
+            self.bounce(moving, normalx, normaly, dt)
+            remaining = remaining[hit]*(1 - timeOfImpact)
+
+    def objectCollisionUpdate(self, boxes, dt):
+        # Player.objectCollisionUpdate: pushes players out of platforms they're inside of
+        # the platforms go one at a time (in order, like the scalar loop), all players at once
+        size = self.size
+        selfLeftWall, selfRightWall = self.x.copy(), self.x + size
+        selfBottomWall, selfTopWall = self.y.copy(), self.y - size
+        cx, cy = self.x + size/2, self.y - size/2
+
+        for objectLeftWall, objectTopWall, objectRightWall, objectBottomWall in zip(*boxes):
+            inside = ((selfRightWall > objectLeftWall) & (selfLeftWall < objectRightWall) &
+                      (selfTopWall < objectBottomWall) & (selfBottomWall > objectTopWall))
+            if not inside.any():
+                continue
+
+            objectSize = objectRightWall - objectLeftWall
+            objcx, objcy = objectLeftWall + objectSize/2, objectBottomWall - objectSize/2
+            distancex = cx[inside] - objcx
+            distancey = cy[inside] - objcy
+
+            xSide = np.abs(distancex) > np.abs(distancey)
+            seperationx = np.where(xSide, size/2 + objectSize/2 - np.abs(distancex), 0)
+            seperationy = np.where(xSide, 0, size/2 + objectSize/2 - np.abs(distancey))
+            seperationx = np.where(distancex < 0, -seperationx, seperationx)
+            seperationy = np.where(distancey < 0, -seperationy, seperationy)
+
+            dist = np.sqrt(seperationx**2 + seperationy**2) + 0.001
+            self.x[inside] += seperationx
+            self.y[inside] += seperationy
+            self.bounce(inside, seperationx/dist, seperationy/dist, dt)
+
+def getAxisTimes(selfMin, selfMax, otherMin, otherMax, d):
+    # physics.getAxisTimes for arrays: entry and exit times, and where they never overlap
+    # (players are rows, platforms are columns)
+    selfMin, selfMax, d = selfMin[:,None], selfMax[:,None], d[:,None]
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        # moving right these are (entry, exit), moving left they're (exit, entry)
+        near = (otherMin - selfMax)/d
+        far = (otherMax - selfMin)/d
+    still = (d == 0)
+    never = still & ((selfMax <= otherMin) | (selfMin >= otherMax))
+    entry = np.where(still, -np.inf, np.minimum(near, far))
+    exit = np.where(still, np.inf, np.maximum(near, far))
+    return entry, exit, never
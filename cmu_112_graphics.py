@@ -24,6 +24,13 @@ LAST_UPDATED  = datetime.date(year=2022, month=3, day=29)
 # Deferred changes:
 #   * replace/augment tkinter canvas with PIL/Pillow imageDraw (perhaps with our own fn names)
 
+# Local changes (Never Getting Over It)
+#  * added retained mode: App(retained=True) updates canvas items between frames
+#    (coords/itemconfig) instead of deleting and recreating all of them
+#  * create_image(pilImage=...) caches the PhotoImage for each PIL image
+#    (canvas.forgetImage(pilImage) after changing its pixels)
+#  * added MvcExempt, a base class for app fields the MVC check skips
+
 # Changes in v0.9.2
 #  * added event.ctrl, event.alt, event.shift
 
@@ -159,9 +166,10 @@ LAST_UPDATED  = datetime.date(year=2022, month=3, day=29)
 
 from tkinter import *
 from tkinter import messagebox, simpledialog, filedialog
-import inspect, copy, traceback
+import inspect, copy, traceback, weakref
 import sys, os
 from io import BytesIO
+from collections import OrderedDict
 
 def failedImport(importName, installName=None):
     installName = installName or importName
@@ -184,9 +192,17 @@ else:
 try: import requests
 except ModuleNotFoundError: failedImport('requests')
 
+class MvcExempt(object):
+    # Base class for app fields that aren't part of the model, so the MVC check only
+    # looks at which object it is and not inside it. For things like caches, indexes
+    # built from the model, worker threads and open files, whose insides change on
+    # their own (or can't be hashed). redrawAll still may not replace them.
+    pass
+
 def getHash(obj):
     # This is used to detect MVC violations in redrawAll
     # @TODO: Make this more robust and efficient
+    if (isinstance(obj, MvcExempt)): return hash(obj)
     try:
         return getHash(obj.__dict__)
     except:
@@ -205,6 +221,13 @@ class WrappedCanvas(Canvas):
         wrappedCanvas.logDrawingCalls = True
         wrappedCanvas.inRedrawAll = False
         wrappedCanvas.app = app
+        wrappedCanvas.retained = app._retained
+        wrappedCanvas.retainedItems = [ ] # (methodName, args, kwargs, item id) from the last frame
+        wrappedCanvas.retainedIndex = None # only set while drawing a frame
+        wrappedCanvas.retainedStats = dict(created=0, updated=0, unchanged=0, deleted=0)
+        wrappedCanvas.imageCache = OrderedDict() # id(pilImage) -> (weakref to it, PhotoImage)
+        wrappedCanvas.frameImages = [ ] # PhotoImages drawn this frame (so they stay alive)
+        wrappedCanvas.imageStats = dict(hits=0, misses=0, evicted=0)
         super().__init__(app._root, width=app.width, height=app.height)
 
     def log(self, methodName, args, kwargs):
@@ -213,14 +236,109 @@ class WrappedCanvas(Canvas):
         if (self.logDrawingCalls):
             self.loggedDrawingCalls.append((methodName, args, kwargs))
 
-    def create_arc(self, *args, **kwargs): self.log('create_arc', args, kwargs); return super().create_arc(*args, **kwargs)
-    def create_bitmap(self, *args, **kwargs): self.log('create_bitmap', args, kwargs); return super().create_bitmap(*args, **kwargs)
-    def create_line(self, *args, **kwargs): self.log('create_line', args, kwargs); return super().create_line(*args, **kwargs)
-    def create_oval(self, *args, **kwargs): self.log('create_oval', args, kwargs); return super().create_oval(*args, **kwargs)
-    def create_polygon(self, *args, **kwargs): self.log('create_polygon', args, kwargs); return super().create_polygon(*args, **kwargs)
-    def create_rectangle(self, *args, **kwargs): self.log('create_rectangle', args, kwargs); return super().create_rectangle(*args, **kwargs)
-    def create_text(self, *args, **kwargs): self.log('create_text', args, kwargs); return super().create_text(*args, **kwargs)
-    def create_window(self, *args, **kwargs): self.log('create_window', args, kwargs); return super().create_window(*args, **kwargs)
+    def create_arc(self, *args, **kwargs): self.log('create_arc', args, kwargs); return self.createItem('create_arc', args, kwargs)
+    def create_bitmap(self, *args, **kwargs): self.log('create_bitmap', args, kwargs); return self.createItem('create_bitmap', args, kwargs)
+    def create_line(self, *args, **kwargs): self.log('create_line', args, kwargs); return self.createItem('create_line', args, kwargs)
+    def create_oval(self, *args, **kwargs): self.log('create_oval', args, kwargs); return self.createItem('create_oval', args, kwargs)
+    def create_polygon(self, *args, **kwargs): self.log('create_polygon', args, kwargs); return self.createItem('create_polygon', args, kwargs)
+    def create_rectangle(self, *args, **kwargs): self.log('create_rectangle', args, kwargs); return self.createItem('create_rectangle', args, kwargs)
+    def create_text(self, *args, **kwargs): self.log('create_text', args, kwargs); return self.createItem('create_text', args, kwargs)
+    def create_window(self, *args, **kwargs): self.log('create_window', args, kwargs); return self.createItem('create_window', args, kwargs)
+
+    # Retained mode (App(retained=True)): instead of deleting every item and drawing
+    # them all again each frame, the nth create_* call in a frame reuses the item made
+    # by the nth call in the last frame. Items whose args and options didn't change are
+    # left alone, the rest get coords() and/or itemconfig(). An item is only recreated
+    # (in the same place in the stacking order) if its type changed or an option was
+    # dropped, since itemconfig can't unset an option.
+
+    def startFrame(self):
+        self.retainedIndex = 0
+
+    def endFrame(self):
+        # delete the items left over from a frame with more create_* calls
+        leftover = self.retainedItems[self.retainedIndex:]
+        if (leftover):
+            super().delete(*[item[3] for item in leftover])
+            del self.retainedItems[self.retainedIndex:]
+            self.retainedStats['deleted'] += len(leftover)
+        self.retainedIndex = None
+
+    def createItem(self, methodName, args, kwargs):
+        create = getattr(Canvas, methodName)
+        if ((not self.retained) or (self.retainedIndex is None)):
+            return create(self, *args, **kwargs)
+        if (args and isinstance(args[-1], dict)):
+            # options passed as a dict (cnf), like tkinter allows
+            kwargs = {**args[-1], **kwargs}
+            args = args[:-1]
+        index = self.retainedIndex
+        self.retainedIndex += 1
+        if (index == len(self.retainedItems)):
+            # more items than last frame, these go on top anyways
+            item = create(self, *args, **kwargs)
+            self.retainedItems.append((methodName, args, kwargs, item))
+            self.retainedStats['created'] += 1
+            return item
+        oldMethodName, oldArgs, oldKwargs, item = self.retainedItems[index]
+        if ((oldMethodName != methodName) or any((key not in kwargs) for key in oldKwargs)):
+            # new item, put where the old one was in the stacking order
+            newItem = create(self, *args, **kwargs)
+            self.tag_lower(newItem, item)
+            super().delete(item)
+            item = newItem
+            self.retainedStats['created'] += 1
+        else:
+            changed = False
+            if (args != oldArgs):
+                self.coords(item, *args)
+                changed = True
+            options = {key:value for (key, value) in kwargs.items()
+                       if ((key not in oldKwargs) or (oldKwargs[key] != value))}
+            if (options):
+                self.itemconfig(item, **options)
+                changed = True
+            self.retainedStats['updated' if changed else 'unchanged'] += 1
+        # (this also keeps images alive for as long as their item is shown)
+        self.retainedItems[index] = (methodName, args, kwargs, item)
+        return item
+
+    # PhotoImage cache for create_image(pilImage=...): the same PIL image (by identity)
+    # gets the same PhotoImage every frame instead of being converted again. Entries
+    # go away when their PIL image is garbage collected (so replacing app.image with a
+    # new image just misses the cache), and the least recently drawn ones are evicted
+    # past imageCacheSize. Call forgetImage after changing a PIL image's pixels in place.
+    imageCacheSize = 64
+
+    def getPhotoImage(self, pilImage):
+        key = id(pilImage)
+        entry = self.imageCache.get(key)
+        if ((entry is not None) and (entry[0]() is pilImage)):
+            self.imageCache.move_to_end(key)
+            self.imageStats['hits'] += 1
+            return entry[1]
+        self.imageStats['misses'] += 1
+        cache = self.imageCache
+        def forget(ref):
+            # (only if the entry is still the one for this ref, ids get reused)
+            if (cache.get(key, (None,))[0] is ref):
+                del cache[key]
+        photoImage = ImageTk.PhotoImage(pilImage)
+        cache[key] = (weakref.ref(pilImage, forget), photoImage)
+        cache.move_to_end(key)
+        while (len(cache) > self.imageCacheSize):
+            cache.popitem(last=False)
+            self.imageStats['evicted'] += 1
+        return photoImage
+
+    def forgetImage(self, pilImage=None):
+        # drop pilImage's PhotoImage (or all of them) from the cache
+        if (pilImage is None):
+            self.imageCache.clear()
+        else:
+            entry = self.imageCache.get(id(pilImage))
+            if ((entry is not None) and (entry[0]() is pilImage)):
+                del self.imageCache[id(pilImage)]
 
     def create_image(self, *args, **kwargs):
         self.log('create_image', args, kwargs);
@@ -235,7 +353,9 @@ class WrappedCanvas(Canvas):
             del kwargs['pilImage']
             if (not isinstance(pilImage, Image.Image)):
                 raise Exception('create_image: pilImage value is not an instance of a PIL/Pillow image')
-            image = ImageTk.PhotoImage(pilImage)
+            image = self.getPhotoImage(pilImage)
+            # an evicted PhotoImage still has to last until the next frame
+            self.frameImages.append(image)
         else:
             image = kwargs['image']
             if (isinstance(image, Image.Image)):
@@ -243,7 +363,7 @@ class WrappedCanvas(Canvas):
                     'You perhaps meant to convert from PIL to Tkinter, like so:\n' +
                     '     canvas.create_image(x, y, image=ImageTk.PhotoImage(image))')
         kwargs['image'] = image
-        return super().create_image(*args, **kwargs)
+        return self.createItem('create_image', args, kwargs)
 
 class App(object):
     majorVersion = MAJOR_VERSION
@@ -271,13 +391,14 @@ class App(object):
     # Implementation:
     ####################################
 
-    def __init__(app, width=300, height=300, x=0, y=0, title=None, autorun=True, mvcCheck=True, logDrawingCalls=True):
+    def __init__(app, width=300, height=300, x=0, y=0, title=None, autorun=True, mvcCheck=True, logDrawingCalls=True, retained=False):
         app.winx, app.winy, app.width, app.height = x, y, width, height
         app.timerDelay = 100     # milliseconds
         app.mouseMovedDelay = 50 # ditto
         app._title = title
         app._mvcCheck = mvcCheck
         app._logDrawingCalls = logDrawingCalls
+        app._retained = retained # update canvas items between frames instead of recreating them
         app._running = app._paused = False
         app._mousePressedOutsideWindow = False
         if autorun: app.run()
@@ -406,7 +527,11 @@ class App(object):
         if (not app._running): return
         if ('deferredRedrawAll' in app._afterIdMap): return # wait for pending call
         app._canvas.inRedrawAll = True
-        app._canvas.delete(ALL)
+        app._canvas.frameImages = [ ]
+        if (app._canvas.retained):
+            app._canvas.startFrame()
+        else:
+            app._canvas.delete(ALL)
         width,outline = (10,'red') if app._paused else (0,'white')
         app._canvas.create_rectangle(0, 0, app.width, app.height, fill='white', width=width, outline=outline)
         app._canvas.loggedDrawingCalls = [ ]
@@ -419,6 +544,8 @@ class App(object):
                 app._mvcViolation('you may not change the app state (the model) in redrawAll (the view)')
         finally:
             app._canvas.inRedrawAll = False
+            if (app._canvas.retained):
+                app._canvas.endFrame()
         app._canvas.update()
 
     def _deferredMethodCall(app, afterId, afterDelay, afterFn, replace=False):
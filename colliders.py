@@ -0,0 +1,249 @@
+# colliders: the shape something collides as (box, circle or convex polygon),
+#   plus Heightfield for ground/water surfaces that go on and on
+#   shapes are relative to the object's position, which is the bottom left corner
+#   (like everywhere else), so one collider can be shared by lots of objects.
+#   each one works out its bounding box ahead of time, so checking if two things
+#   could be touching is still just four comparisons, and the exact check
+#   (separating axis theorem) only runs for the ones that pass
+
+# separating axis theorem: two convex shapes don't overlap if there's a line (axis)
+# where their shadows (projections) don't overlap. for polygons only the edge normals
+# have to be checked, and for a circle the line towards the closest corner
+#   https://dyn4j.org/2010/01/sat/
+
+import math
+
+class AABBCollider:
+    # width x height box, the same shape objects have always had
+    kind = "box"
+
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.bounds = (0, -height, width, 0) # left, top, right, bottom
+        self.points = ((0, 0), (width, 0), (width, -height), (0, -height))
+        self.axes = ((1, 0), (0, 1))
+        self.center = (width/2, -height/2)
+
+class CircleCollider:
+    # circle that fits in a 2*radius box (so it lines up with a square the same size)
+    kind = "circle"
+
+    def __init__(self, radius):
+        self.radius = radius
+        self.bounds = (0, -2*radius, 2*radius, 0)
+        self.points = ()
+        self.axes = ()
+        self.center = (radius, -radius)
+
+class PolygonCollider:
+    # convex polygon, points relative to the position (in either order)
+    kind = "polygon"
+
+    def __init__(self, points):
+        if len(points) < 3:
+            raise ValueError("a polygon needs at least 3 points")
+        self.points = tuple((float(x), float(y)) for x, y in points)
+        xs = [x for x, y in self.points]
+        ys = [y for x, y in self.points]
+        self.bounds = (min(xs), min(ys), max(xs), max(ys))
+        self.center = (sum(xs)/len(xs), sum(ys)/len(ys))
+
+        # edge normals, skipping ones that point the same way (or the opposite way)
+        # as one already found, since they'd give the same shadows
+        axes = []
+        for i in range(len(self.points)):
+            (x0, y0), (x1, y1) = self.points[i], self.points[(i + 1) % len(self.points)]
+            length = math.hypot(x1 - x0, y1 - y0)
+            if length == 0:
+                continue
+            axis = ((y1 - y0)/length, (x0 - x1)/length)
+            if all(abs(axis[0]*other[1] - axis[1]*other[0]) > 1e-9 for other in axes):
+                axes.append(axis)
+        self.axes = tuple(axes)
+
+# boxes only come in a few sizes, so they're shared
+squares = dict()
+
+def getSquare(size):
+    if size not in squares:
+        squares[size] = AABBCollider(size, size)
+    return squares[size]
+
+def isBox(collider):
+    return collider.kind == "box"
+
+def getBounds(collider, x, y):
+    # (left, top, right, bottom) of the collider at (x, y)
+    left, top, right, bottom = collider.bounds
+    return (x + left, y + top, x + right, y + bottom)
+
+def getCenter(collider, x, y):
+    return x + collider.center[0], y + collider.center[1]
+
+def project(collider, x, y, axisx, axisy):
+    # (min, max) of the collider's shadow on the axis
+    if collider.kind == "circle":
+        cx, cy = getCenter(collider, x, y)
+        middle = cx*axisx + cy*axisy
+        return middle - collider.radius, middle + collider.radius
+    values = [(x + px)*axisx + (y + py)*axisy for px, py in collider.points]
+    return min(values), max(values)
+
+def getCircleAxis(circle, cx, cy, other, x, y):
+    # the axis from the circle's center to the closest corner of other
+    closest = min(((x + px - cx)**2 + (y + py - cy)**2, x + px, y + py)
+                  for px, py in other.points)
+    dx, dy = closest[1] - cx, closest[2] - cy
+    length = math.hypot(dx, dy)
+    if length == 0:
+        return None
+    return dx/length, dy/length
+
+def collide(a, ax, ay, b, bx, by):
+    # if collider a at (ax, ay) overlaps collider b at (bx, by), returns the smallest
+    # push that gets a out of b: (normalx, normaly, depth) with the normal pointing
+    # from b towards a. returns None if they don't overlap (touching doesn't count)
+    aLeft, aTop, aRight, aBottom = getBounds(a, ax, ay)
+    bLeft, bTop, bRight, bBottom = getBounds(b, bx, by)
+    if not (aRight > bLeft and aLeft < bRight and aTop < bBottom and aBottom > bTop):
+        return None
+
+    acx, acy = getCenter(a, ax, ay)
+    bcx, bcy = getCenter(b, bx, by)
+
+    if a.kind == "circle" and b.kind == "circle":
+        dx, dy = acx - bcx, acy - bcy
+        distance = math.hypot(dx, dy)
+        depth = a.radius + b.radius - distance
+        if depth <= 0:
+            return None
+        if distance == 0:
+            return 0, -1, depth
+        return dx/distance, dy/distance, depth
+
+    axes = list(a.axes) + list(b.axes)
+    if a.kind == "circle":
+        axes.append(getCircleAxis(a, acx, acy, b, bx, by))
+    elif b.kind == "circle":
+        axes.append(getCircleAxis(b, bcx, bcy, a, ax, ay))
+
+    best = None
+    for axis in axes:
+        if axis is None:
+            continue
+        axisx, axisy = axis
+        aMin, aMax = project(a, ax, ay, axisx, axisy)
+        bMin, bMax = project(b, bx, by, axisx, axisy)
+        overlap = min(aMax, bMax) - max(aMin, bMin)
+        if overlap <= 0:
+            return None # found a gap, so they don't overlap
+        if best is None or overlap < best[2]:
+            # point the normal from b to a
+            if (acx - bcx)*axisx + (acy - bcy)*axisy < 0:
+                axisx, axisy = -axisx, -axisy
+            best = (axisx, axisy, overlap)
+    return best
+
+def drawCollider(canvas, collider, x, y, **options):
+    # outline of the collider at (x, y) on the screen
+    if collider.kind == "circle":
+        left, top, right, bottom = getBounds(collider, x, y)
+        canvas.create_oval(left, top, right, bottom, **options)
+    else:
+        canvas.create_polygon([(x + px, y + py) for px, py in collider.points], **options)
+
+class Heightfield:
+    # a ground (or water) surface: one height (y on the screen) per column, with the
+    # columns spacing pixels apart starting at x0. in between the middles of the
+    # columns the height is interpolated, so looking up the surface anywhere is O(1)
+    # however many columns there are (instead of making every column an object)
+    kind = "heightfield"
+
+    def __init__(self, heights, spacing, x0 = 0, solid = True):
+        self.spacing = spacing
+        self.x0 = x0
+        self.solid = solid # if Player.updatePosition should land on it
+        self.version = 0 # goes up when the heights change
+        self.setHeights(heights)
+
+    def setHeights(self, heights):
+        self.heights = list(heights)
+        # highest point, anything above it can't be touching (like a bounding box)
+        self.top = min(self.heights) if len(self.heights) > 0 else math.inf
+        self.version += 1
+
+    def getColumn(self, x):
+        # (column to the left of x, how far x is towards the next one from 0 to 1)
+        # past either end it's the end column
+        u = (x - self.x0)/self.spacing - 1/2
+        last = len(self.heights) - 1
+        if u <= 0:
+            return 0, 0
+        if u >= last:
+            return last, 0
+        col = int(u)
+        return col, u - col
+
+    def getHeight(self, x):
+        col, t = self.getColumn(x)
+        heights = self.heights
+        if t == 0:
+            return heights[col]
+        return heights[col] + (heights[col + 1] - heights[col])*t
+
+    def getSlope(self, x):
+        # dy/dx of the surface at x (flat past the end columns)
+        u = (x - self.x0)/self.spacing - 1/2
+        if u < 0 or u >= len(self.heights) - 1:
+            return 0
+        col = int(u)
+        return (self.heights[col + 1] - self.heights[col])/self.spacing
+
+    def getSamples(self, left, right):
+        # the xs between left and right where the surface can be highest: the ends
+        # and every column middle in between (it's straight lines in between those)
+        first = math.ceil((left - self.x0)/self.spacing - 1/2)
+        last = math.floor((right - self.x0)/self.spacing - 1/2)
+        first, last = max(first, 0), min(last, len(self.heights) - 1)
+        return [left, right] + [self.x0 + (col + 1/2)*self.spacing
+                                for col in range(first, last + 1)]
+
+    def getDepth(self, collider, x, y):
+        # how far the collider at (x, y) goes below the surface (0 or less if it doesn't),
+        # and where along x that is (None when it's way above the highest point, then
+        # the depth is just how far above that it is)
+        left, top, right, bottom = getBounds(collider, x, y)
+        if bottom < self.top - 1:
+            return bottom - self.top, None
+        samples = self.getSamples(left, right)
+        circle = collider.kind == "circle"
+        if circle:
+            cx, cy = getCenter(collider, x, y)
+            samples.append(cx)
+        best = None
+        for sampleX in samples:
+            if circle:
+                # bottom of the circle at sampleX
+                bottom = cy + max(0, collider.radius**2 - (sampleX - cx)**2)**0.5
+            depth = bottom - self.getHeight(sampleX)
+            if best is None or depth > best[0]:
+                best = (depth, sampleX)
+        return best
+
+    def collide(self, collider, x, y):
+        # like colliders.collide: (normalx, normaly, depth) to push the collider back up
+        # out of the surface, or None if it's above it
+        # (polygons are treated as their bounding box here)
+        depth, sampleX = self.getDepth(collider, x, y)
+        if depth <= 0:
+            return None
+        slope = self.getSlope(sampleX)
+        length = math.hypot(slope, 1)
+        return slope/length, -1/length, depth
+
+def drawHeightfield(canvas, heightfield, scroll, bottom, **options):
+    # the surface as a filled polygon down to bottom
+    points = [(heightfield.x0 + (col + 1/2)*heightfield.spacing - scroll, height)
+              for col, height in enumerate(heightfield.heights)]
+    points = [(points[0][0], bottom)] + points + [(points[-1][0], bottom)]
+    canvas.create_polygon(points, **options)
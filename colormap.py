@@ -0,0 +1,54 @@
+# color lookup tables (palettes) for drawing noise
+
+# formatting a new hex string for every cell every frame is slow, so instead noise
+# values get quantized to 256 levels and looked up in a palette that's made once
+
+# numpy is optional, mapColors just uses a list comprehension without it
+try: import numpy as np
+except ModuleNotFoundError: np = None
+
+PALETTE_SIZE = 256
+
+def makePalette(getColor):
+    # builds a palette from a function that takes a level (0-255) and returns a color
+    return [getColor(level) for level in range(PALETTE_SIZE)]
+
+def toHex(r,g,b):
+    return f"#{r:02X}{g:02X}{b:02X}"
+
+# black -> white, and black -> cyan (used for the water)
+GRAYSCALE = makePalette(lambda level: toHex(level, level, level))
+BLUE = makePalette(lambda level: toHex(0, level, level))
+
+def makeGradientPalette(stops):
+    # palette that blends between colors, ex: [(0, (0,0,128)), (0.5, (0,200,255)), (1, (255,255,255))]
+    # stops are (position from 0 to 1, (r,g,b)), sorted by position
+    def getColor(level):
+        position = level/(PALETTE_SIZE - 1)
+        for (position0, color0), (position1, color1) in zip(stops, stops[1:]):
+            if position <= position1:
+                break
+        if position1 == position0:
+            t = 0
+        else:
+            t = min(1, max(0, (position - position0)/(position1 - position0)))
+        r, g, b = [round(c0 + (c1 - c0)*t) for c0, c1 in zip(color0, color1)]
+        return toHex(r, g, b)
+    return makePalette(getColor)
+
+def getLevel(value, low = 0, high = 2):
+    # quantizes value (from low to high) to a palette index
+    level = int((value - low)*((PALETTE_SIZE - 1)/(high - low)))
+    return min(PALETTE_SIZE - 1, max(0, level))
+
+def getColor(value, palette, low = 0, high = 2):
+    return palette[getLevel(value, low, high)]
+
+def mapColors(values, palette, low = 0, high = 2):
+    # colors for a whole row of values at once
+    scale = (PALETTE_SIZE - 1)/(high - low)
+    if np is not None:
+        levels = np.clip(((np.asarray(values) - low)*scale).astype(int), 0, PALETTE_SIZE - 1)
+        return [palette[level] for level in levels.tolist()]
+    top = PALETTE_SIZE - 1
+    return [palette[min(top, max(0, int((value - low)*scale)))] for value in values]
@@ -0,0 +1,80 @@
+# headless runner: runs the game logic from main.py in a tight loop with no window,
+# no canvas and no images, for soak tests and benchmarks (ex: on a build machine)
+
+#   python headless.py --ticks 100000 --seed 1 --launch 200:300,300,0,600
+
+import time
+import argparse
+import main
+
+class HeadlessApp:
+    # stands in for the cmu_112_graphics app, just somewhere to keep the model
+    def __init__(self, width = 1000, height = 600):
+        self.width, self.height = width, height
+
+def createGame(seed = None, width = 1000, height = 600):
+    app = HeadlessApp(width, height)
+    main.initGame(app, seed, backgroundGeneration = False)
+    return app
+
+def launch(app, vector):
+    # same as dragging from (x1,y1) to (x2,y2) and letting go
+    app.vector = list(vector)
+    app.player.updateVelocity(app)
+
+def tick(app):
+    # one timerFired, with exactly one physics step instead of however much real time passed
+    app.clock.step(lambda dt: main.physicsStep(app, dt))
+    main.updateGame(app)
+
+def runHeadless(app, ticks, launches = None, restartOnDeath = True):
+    # runs ticks ticks, launching the player at the ticks in launches ({tick: vector})
+    # returns stats about the run, including ticks per second
+    launches = launches or dict()
+    deaths = 0
+    bestScore = 0
+    ran = 0
+
+    start = time.perf_counter()
+    for t in range(ticks):
+        ran += 1
+        if t in launches:
+            launch(app, launches[t])
+        tick(app)
+        bestScore = max(bestScore, app.score)
+        if app.gameOver:
+            deaths += 1
+            if not restartOnDeath:
+                break
+            main.resetGame(app)
+    seconds = time.perf_counter() - start
+
+    return {"ticks": ran, "seconds": seconds, "ticksPerSecond": ran/max(seconds, 1e-9),
+            "deaths": deaths, "bestScore": bestScore, "position": app.player.getPosition()}
+
+def parseLaunch(text):
+    # "tick:x1,y1,x2,y2" -> (tick, [x1,y1,x2,y2])
+    tickText, vectorText = text.split(":")
+    return int(tickText), [float(value) for value in vectorText.split(",")]
+
+def main_(args = None):
+    parser = argparse.ArgumentParser(description = "run the game logic without a window")
+    parser.add_argument("--ticks", type = int, default = 10000)
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--launch", action = "append", default = [], type = parseLaunch,
+                        help = "tick:x1,y1,x2,y2 (can be used more than once)")
+    parser.add_argument("--stop-on-death", action = "store_true")
+    options = parser.parse_args(args)
+
+    app = createGame(options.seed)
+    stats = runHeadless(app, options.ticks, dict(options.launch),
+                        restartOnDeath = not options.stop_on_death)
+    main.appStopped(app)
+
+    print(f"seed {app.seed}: {stats['ticks']} ticks in {stats['seconds']:.2f}s "
+          f"({stats['ticksPerSecond']:,.0f} ticks/s), {stats['deaths']} deaths, "
+          f"best score {stats['bestScore']}")
+    return stats
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,83 @@
+# background level generation
+#   builds the upcoming platform heights (and noise chunks) ahead of the player on
+#   a worker thread, so generating terrain never happens in the middle of a frame
+
+import threading
+import queue
+from collections import deque
+from cmu_112_graphics import MvcExempt
+
+class LevelProducer(MvcExempt):
+    # pulls values from a perlin.TerrainStream on a background thread and hands them
+    # to the game loop in batches, keeping maxBatches of them made ahead of time
+    # it also warms up rows of a perlin.NoiseChunkCache when asked to (requestRow)
+
+    # the worker sleeps on one queue of jobs (another batch, a noise row, or None to
+    # stop), so it only wakes up when there's something to do
+
+    # with background = False nothing runs on a thread, values are just computed
+    # when they're asked for (same values in the same order either way)
+
+    def __init__(self, terrain, noise = None, batchSize = 8, maxBatches = 4, background = True):
+        self.terrain = terrain
+        self.noise = noise
+        self.batchSize = batchSize
+        self.background = background
+
+        self.jobs = queue.Queue() # ("batch",), ("row", row, col, count) or None
+        self.batches = queue.Queue() # finished batches of values (or the worker's crash)
+        self.ready = deque() # values taken out of the queue, not used yet
+        self.thread = None
+        self.error = None # whatever the worker crashed with, raised again by nextValue
+
+        if background:
+            for _ in range(maxBatches):
+                self.jobs.put(("batch",))
+            self.thread = threading.Thread(target = self.run, daemon = True)
+            self.thread.start()
+
+    def run(self):
+        # worker thread: makes batches and fetches noise rows as they're asked for
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                if job[0] == "batch":
+                    self.batches.put([next(self.terrain) for _ in range(self.batchSize)])
+                else:
+                    row, col, count = job[1:]
+                    self.noise.getRow(row, col, count)
+        except BaseException as error:
+            # handed to the game loop instead of dying quietly and leaving it waiting
+            self.batches.put(error)
+
+    def nextValue(self):
+        # the next terrain value, in the same order as next(terrain)
+        if not self.background:
+            return next(self.terrain)
+        if len(self.ready) == 0:
+            if self.error is not None:
+                raise self.error
+            if self.thread is None and self.batches.empty():
+                raise RuntimeError("the level producer was stopped")
+            # only waits if the worker hasn't caught up yet (right after starting)
+            batch = self.batches.get()
+            if isinstance(batch, BaseException):
+                self.error = batch
+                raise batch
+            self.ready.extend(batch)
+            # and the worker makes another one to replace it
+            self.jobs.put(("batch",))
+        return self.ready.popleft()
+
+    def requestRow(self, row, col, count):
+        # asks the worker to generate the noise chunks for a row before it's needed
+        if self.background and self.noise is not None:
+            self.jobs.put(("row", row, col, count))
+
+    def stop(self):
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join()
+            self.thread = None
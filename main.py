@@ -1,12 +1,17 @@
 from cmu_112_graphics import *
+import random
 import perlin
+import colormap
+import colliders
 import physics
+import levelgen
+import replay
+import solver
 
 # modified from perlin.getCellBounds (which was from 112 notes)
 def findWaterBounds(app,value,col):
 
-    rows = len(app.perlinArray)
-    cols = len(app.perlinArray[0])
+    cols = app.waterColumns
 
     x0 = app.width * col / cols
     x1 = app.width * (col+1) / cols
@@ -19,11 +24,11 @@ def findWaterBounds(app,value,col):
     return (x0,y0,x1,y1)
 
 def drawWater(app,canvas):
-    for col in range(len(app.perlinArray[app.row])):
-        value = app.perlinArray[app.row][col] + 1
+    for col in range(len(app.waterRow)):
+        value = app.waterRow[col] + 1
         (x0, y0, x1, y1) = findWaterBounds(app,value,col)
         canvas.create_rectangle(x0, y0, x1, y1, width = 0,
-        fill = perlin.getCellColorBlue(value))
+        fill = app.waterColors[col])
 
 def drawBackground(app,canvas):
     canvas.create_rectangle(0,0,app.width,app.height, fill = "blue")
@@ -39,6 +44,13 @@ def gameOverScreen(app,canvas):
     canvas.create_text(app.width/2,app.height/2 + 100, fill = "grey",
                 text = f"Press R to restart", font = "arial 15 ")
 
+def drawHint(app,canvas):
+    # the drag the solver found (press h), from the middle of the player
+    if app.hint is None:
+        return
+    x1,y1,x2,y2 = solver.getVector(app.player, app.hint, app.scroll)
+    canvas.create_line(x1, y1, x2, y2, fill = "yellow", width = 3, dash = (6,4))
+
 def redrawAll(app,canvas):
     if app.gameOver:
         gameOverScreen(app,canvas)
@@ -47,7 +59,8 @@ def redrawAll(app,canvas):
     app.player.drawPlayer(canvas,app.scroll,app.egg)
     drawWater(app,canvas)
     physics.drawObjects(app,canvas,app.scroll,app.toast)
-    physics.drawVector(app,canvas)
+    physics.drawVector(app,canvas,app.scroll)
+    drawHint(app,canvas)
     
     
     drawUI(app,canvas)
@@ -63,69 +76,168 @@ def sideScroll(app):
         app.scroll = x - app.width + app.width/3
 
 def checkDeath(app):
+    # touching the water kills the player. the water is drawn in the same place on
+    # the screen however far it's scrolled, so its surface moves along with the scroll
     x,y = app.player.getPosition()
-    if y >= app.height - app.blockSize:
+    app.water.x0 = app.scroll
+    depth, waterX = app.water.getDepth(app.player.getCollider(), x, y)
+    if depth > 0:
         app.gameOver = True
 
 def timerFired(app):
     if app.gameOver:
         return
+    app.clock.update(lambda dt: physicsStep(app, dt))
+    updateGame(app)
+    checkHint(app)
+    # nothing's moving while the player sleeps on a platform (see physics.Player), so
+    # the timer slows down until the player gets launched (the water still moves, just
+    # in bigger jumps)
+    if app.player.sleeping and app.vector is None:
+        app.timerDelay = app.idleTimerDelay
+    else:
+        app.timerDelay = app.activeTimerDelay
+
+# the game logic is split into these model-only steps (no canvas or images)
+# so it can also be run without a window (see headless.py)
+
+def physicsStep(app, dt):
+    # one fixed physics step. death is checked every step (not just every frame)
+    # so it happens on the same tick no matter how the steps are split into frames,
+    # which replays depend on
+    if app.gameOver:
+        return
+    app.player.updatePosition(app, dt)
+    # the scroll and the water are updated here too (not just once a frame) since
+    # the death check depends on them
+    sideScroll(app)
+    updateWaterRow(app)
+    checkDeath(app)
+
+def updateGame(app):
+    # everything besides the physics that happens once a frame
     app.frame += 1
-    app.player.updatePosition(app)
     sideScroll(app)
     generateNewObjects(app)
-    if app.frame % 50 == 0:
-        app.row = (app.row + 1) % (app.rows-1)
+    updateWaterRow(app)
     app.score = app.player.getScore()
-    checkDeath(app)
 
 def mousePressed(app,event):
+    replay.record(app, replay.MOUSE_PRESSED, event)
+    app.timerDelay = app.activeTimerDelay
     physics.startVector(app,event,app.scroll)
     
 def mouseDragged(app,event):
+    replay.record(app, replay.MOUSE_DRAGGED, event)
     physics.updateVector(app,event, app.scroll)
 
 def mouseReleased(app,event):
+    replay.record(app, replay.MOUSE_RELEASED, event)
     physics.stopVector(app,event, app.scroll)
+    app.hint = None
+    app.hintSearch = None
 
 def keyPressed(app,event):
+    replay.record(app, replay.KEY_PRESSED, event)
     if event.key == "r":
-        app.player.setPosition(app.startingPosition)
-        app.player.setVelocity((0,0))
-        app.scroll = 0
-        app.farthestObject = 0
-        app.objects = []
-        generateNewObjects(app)
-        app.gameOver = False
+        resetGame(app)
+    elif event.key == "h" and not app.gameOver:
+        showHint(app)
+
+def showHint(app):
+    # asks the solver for a launch onto the next platform. it searches on a thread
+    # for up to a third of a second, and checkHint picks up the answer
+    if not app.hintsEnabled or app.hintSearch is not None:
+        return
+    platforms = app.objects.queryRange(app.scroll, app.scroll + 3*app.width)
+    app.hintSearch = solver.ShotSearch(app.player, platforms, budget = 1/3)
+
+def checkHint(app):
+    if app.hintSearch is not None and app.hintSearch.isDone():
+        shots = app.hintSearch.shots
+        app.hint = shots[0]["drag"] if len(shots) > 0 else None
+        app.hintSearch = None
+
+def resetGame(app):
+    app.player.setPosition(app.startingPosition)
+    app.player.setVelocity((0,0))
+    app.scroll = 0
+    app.farthestObject = 0
+    app.objects.clear()
+    startTerrain(app)
+    generateNewObjects(app)
+    app.clock.reset()
+    app.hint = None
+    app.hintSearch = None
+    app.gameOver = False
+
+def updateWaterRow(app):
+    # the water moves down a row every half second of game time
+    row = app.clock.ticks // 50
+    if row != app.row:
+        app.row = row
+        updateWater(app)
+
+def updateWater(app):
+    # the water is drawn from one row of the noise field, fetched here instead of
+    # in redrawAll since generating a chunk changes the cache (the model)
+    app.waterRow = app.noise.getRow(app.row, 0, app.waterColumns)
+    # colors only change with the row, so they're looked up here and not every frame
+    # (same as perlin.getCellColorBlue, which takes values shifted up by 1)
+    app.waterColors = colormap.mapColors(app.waterRow, colormap.BLUE, -1, 1)
+    # and the surface is what checkDeath uses (tops of the drawn columns)
+    app.water.setHeights([findWaterBounds(app, value + 1, col)[3]
+                          for col, value in enumerate(app.waterRow)])
+    # and the next chunk down gets made in the background before the water reaches it
+    app.levelProducer.requestRow(app.row + app.noise.chunkSize, 0, app.waterColumns)
+
+def startTerrain(app):
+    # (re)starts the platform heights from the beginning of the seed
+    if app.levelProducer is not None:
+        app.levelProducer.stop()
+    terrain = perlin.TerrainStream(app.seed, app.blockDistance, octaves = 3)
+    app.levelProducer = levelgen.LevelProducer(terrain, app.noise,
+                                               background = app.backgroundGeneration)
 
 def getBlockHeight(app):
-    row = app.currentBlockRow
-    col = app.currentBlockCol
-    return app.height * (app.perlinArray[row][col] + 1)/2 + app.blockSize
+    # the next platform height from the 1D terrain noise (made ahead of time in the background)
+    return app.height * (app.levelProducer.nextValue() + 1)/2 + app.blockSize
 
 def generateNewObjects(app):
     if len(app.objects) == 0:
         # generate starting platform
         x = app.startingPosition[0]
-        app.objects.append(physics.Object(x,app.height/2 + app.blockSize,app.blockSize))
+        app.objects.add(x,app.height/2 + app.blockSize,app.blockSize)
     else:
         x,y = app.player.getPosition()
-        if x > app.farthestObject - app.blockDistance:
+        # while, not if, so a fast launch can't get ahead of the platforms
+        while x > app.farthestObject - app.blockDistance:
             newX = app.farthestObject + app.blockDistance
             height = getBlockHeight(app)
-            app.objects.append(physics.Object(newX,height,app.blockSize))
+            app.objects.add(newX,height,app.blockSize)
             app.farthestObject = newX
-            app.currentBlockCol = app.currentBlockCol + 1 
-            if app.currentBlockCol > app.rows - 1:
-                app.currentBlockCol = 0
-                app.currentBlockRows = (app.currentBlockRows + 1) % (app.rows - 1)
-    
-    if len(app.objects) >= 10:
-        app.objects = app.objects[1:]
 
 
 def appStarted(app):
-    app.timerDelay = 1
+    initGame(app)
+    app.timerDelay = app.activeTimerDelay
+    # every session gets recorded to replays/ (see replay.py to play one back)
+    app.recorder = replay.ReplayRecorder.startSession(app.seed)
+    app.hintsEnabled = True
+
+    app.egg = app.loadImage('egg.png')
+    app.egg = app.scaleImage(app.egg,1/20)
+
+    app.toast = app.loadImage('toast.png')
+    app.toast = app.scaleImage(app.toast,1/10)
+
+def initGame(app, seed = None, backgroundGeneration = True):
+    # sets up the model (everything but the images)
+    # without backgroundGeneration, the terrain is made when it's needed instead of
+    # on a thread (same terrain either way)
+    app.clock = physics.FixedTimestep() # physics runs at a fixed rate, not once a frame
+    app.activeTimerDelay = 1
+    app.idleTimerDelay = 50 # while the player is asleep
     app.frame = 0
     app.scroll = 0
     app.score = 0
@@ -135,30 +247,49 @@ def appStarted(app):
     app.player = physics.Player(app.startingPosition,50)
 
     app.vector = None
-
-    app.objects = []
+    app.recorder = None
+    app.hint = None # drag from the solver (see showHint)
+    app.hintSearch = None
+    # only the game in a window searches for hints, not headless runs or replays
+    # (the solver's worker processes start on the first search)
+    app.hintsEnabled = False
+    app.preview = physics.TrajectoryPreview() # predicted path while dragging
+
+    # platforms, sorted by x. once there are maxObjects, each new one replaces the
+    # one farthest behind (they're cheap to keep around, collisions and drawing
+    # only look at the ones nearby)
+    app.maxObjects = 200
+    app.objects = physics.PlatformStore(app.maxObjects)
     app.blockSize = 100
     app.farthestObject = 0
     app.blockDistance = 400
-    app.currentBlock = 0
-    app.currentBlockRow = 0
-    app.currentBlockCol = 0
-    generateNewObjects(app)
 
-    app.perlinArray = perlin.generate2DPerlinArray(10,10,1/10)
+    # endless noise for the platform heights (1D) and the water (2D)
+    if seed is None:
+        seed = random.randrange(2**32)
+    app.seed = seed # same seed = same terrain
+    app.backgroundGeneration = backgroundGeneration
+    app.noise = perlin.NoiseChunkCache(app.seed, octaves = 3)
+    app.levelProducer = None
+    startTerrain(app)
+    generateNewObjects(app)
 
     app.row = 0
-    app.rows = len(app.perlinArray)
-    app.cols = len(app.perlinArray[0])
-
-    app.egg = app.loadImage('egg.png')
-    app.egg = app.scaleImage(app.egg,1/20)
+    app.waterColumns = 90
+    # the water surface as a heightfield (not solid, just for checkDeath)
+    app.water = colliders.Heightfield([], app.width/app.waterColumns, solid = False)
+    updateWater(app)
 
-    app.toast = app.loadImage('toast.png')
-    app.toast = app.scaleImage(app.toast,1/10)
+def appStopped(app):
+    app.levelProducer.stop()
+    if app.recorder is not None:
+        app.recorder.close()
+    solver.stopPool()
 
 def main():
-    runApp(width = 1000, height = 600)
+    # retained: the canvas items are updated every frame instead of all being
+    # deleted and made again (see WrappedCanvas in cmu_112_graphics)
+    runApp(width = 1000, height = 600, retained = True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
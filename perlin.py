@@ -9,36 +9,91 @@
 
 # used when generating gradients
 import random
+import sys
 import math
+import time
+import threading
+import os
+import struct
+import mmap
+import array
+from collections import OrderedDict
 from cmu_112_graphics import *
+import colormap
+
+# numpy is optional: without it, the batched functions below fall back to the scalar path
+try: import numpy as np
+except ModuleNotFoundError: np = None
 
 # DISCLAIMER: for this entire program, (0,0) is defined as the top left of the screen
 
+# list of 8 normalized unit vectors that gradients are picked from
+# idea modified from the 3D version in Ken Perlin's "Improving Noise" paper
+sqrt2 = math.sqrt(2)
+UNIT_VECTORS = [(0,1),(0,-1),(1,0),(-1,0), 
+        (sqrt2/2,sqrt2/2), (sqrt2/2, -sqrt2/2), 
+        (-sqrt2/2, sqrt2/2), (-sqrt2/2,-sqrt2/2)]
+
 # generates a grid of pseudorandom gradient (unit) vectors
+# (finite and unseeded, see GradientField for the seeded version that goes on forever)
 def generateGrid(rows,cols):
 
     # generates empty grid of gradients (unit vectors)
     gradients = [[(0,0)]*cols for _ in range(rows)]
-
-    # generages list of 8 random normalized unit vectors
-    # idea modified from the 3D version in Ken Perlin's "Improving Noise" paper
-    sqrt2 = math.sqrt(2)
-    unitVectorList = [(0,1),(0,-1),(1,0),(-1,0), 
-            (sqrt2/2,sqrt2/2), (sqrt2/2, -sqrt2/2), 
-            (-sqrt2/2, sqrt2/2), (-sqrt2/2,-sqrt2/2)]
     
     # populates array with gradient vectors (random unit vectors)
-    # TODO: make these pseudorandom, generated by a seed
     for row in range(rows):
         for col in range(cols):
-            gradients[row][col] = random.choice(unitVectorList)
+            gradients[row][col] = random.choice(UNIT_VECTORS)
     
     return gradients
 
+class GradientField:
+    # seeded gradients for every integer lattice point, without storing a grid
+    # (x,y) is hashed through a shuffled permutation table, like in Ken Perlin's
+    # "Improving Noise" paper, and the hash picks one of the 8 UNIT_VECTORS.
+    # memory is just the table, no matter how far out you sample,
+    # and the same seed always gives the same gradients (the pattern repeats every 256 cells)
+
+    tableSize = 256
+
+    def __init__(self, seed = None):
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+
+        permutation = list(range(self.tableSize))
+        random.Random(seed).shuffle(permutation)
+        # doubled so that permutation[a] + b never needs another wrap
+        self.permutation = permutation + permutation
+
+        if np is not None:
+            self.permutationArray = np.array(self.permutation)
+            self.vectorArray = np.array(UNIT_VECTORS)
+
+    def hash(self, x, y):
+        # & 255 wraps negative coordinates too
+        p = self.permutation
+        return p[p[x & 255] + (y & 255)] & 7
+
+    def getGradient(self, x, y):
+        return UNIT_VECTORS[self.hash(x, y)]
+
+    def getSlope(self, x):
+        # 1D gradient (just a slope from -1 to 1) at integer x, for perlin1D
+        return self.permutation[x & 255]/127.5 - 1
+
+    def getGradients(self, xs, ys):
+        # vectorized getGradient for integer numpy arrays
+        # returns the x and y components as two arrays shaped like xs
+        p = self.permutationArray
+        vectors = self.vectorArray[p[p[xs & 255] + (ys & 255)] & 7]
+        return vectors[...,0], vectors[...,1]
+
 def findLatticePoints(x,y):
     # finds closet lattice points to an (x,y) pair
-    # assumes x and y are floats
-    x0,y0 = int(x), int(y) 
+    # assumes x and y are floats (floor instead of int so negative coordinates work)
+    x0,y0 = math.floor(x), math.floor(y)
     x1,y1 = x0 + 1, y0 + 1
 
     # finds the (x,y) coordinates inside of the lattice point grid
@@ -50,7 +105,9 @@ def findLatticePoints(x,y):
 def findGradient(x,y,gradients):
     # finds the gradient vector at an (x,y) lattice point
     # assumes x and y are integers
-    if x < 0 or x >= len(gradients) or y < 0 or y >= len(gradients):
+    if isinstance(gradients, GradientField):
+        return gradients.getGradient(x,y)
+    elif x < 0 or x >= len(gradients) or y < 0 or y >= len(gradients):
         print("ERROR: gradient out of bounds")
         print(f"x,y = {x,y}")
         return None
@@ -147,8 +204,281 @@ def perlin(x,y,gradients, debug = False):
 
     return round(bilerp,4)
 
-def generatePerlinArray(xmax,ymax,stepsize,gradients):
-    # generates a 2D array filled with perlin noise
+# largest difference between perlinBatch() and perlin() on the 2-decimal coordinates
+# generatePerlinArray uses (perlin() rounds its dot products and result to 4 places)
+BATCH_TOLERANCE = 1e-3
+
+def findBatchGradients(xs,ys,gradients):
+    # vectorized findGradient: looks up the gradients at arrays of lattice points
+    # returns the x and y components as two arrays shaped like xs
+    if isinstance(gradients, GradientField):
+        return gradients.getGradients(xs,ys)
+    elif (xs.min() < 0 or xs.max() >= len(gradients) or
+        ys.min() < 0 or ys.max() >= len(gradients)):
+        raise IndexError("gradient out of bounds")
+    gradientArray = np.asarray(gradients, dtype = float)
+    vectors = gradientArray[ys,xs]
+    return vectors[...,0], vectors[...,1]
+
+def perlinBatch(xs,ys,gradients):
+    # same algorithm as perlin(), but for whole arrays of (x,y) coordinates at once
+    # instead of one interpreted call per point, every step runs over the entire array
+    # perlin() is kept as the reference, this matches it to within BATCH_TOLERANCE
+    xs = np.asarray(xs, dtype = float)
+    ys = np.asarray(ys, dtype = float)
+
+    # lattice points and (xc,yc) coordinates inside each cell (see findLatticePoints)
+    x0, y0 = np.floor(xs).astype(int), np.floor(ys).astype(int)
+    x1, y1 = x0 + 1, y0 + 1
+    xc, yc = xs - x0, ys - y0
+
+    # gradients of the 4 corners
+    g1x, g1y = findBatchGradients(x0,y0,gradients)
+    g2x, g2y = findBatchGradients(x1,y0,gradients)
+    g3x, g3y = findBatchGradients(x0,y1,gradients)
+    g4x, g4y = findBatchGradients(x1,y1,gradients)
+
+    # dot products with the distance vectors (see findDistanceVectors)
+    dx, dy = 1 - xc, 1 - yc
+    v1 = g1x*xc + g1y*yc
+    v2 = g2x*dx + g2y*yc
+    v3 = g3x*xc + g3y*dy
+    v4 = g4x*dx + g4y*dy
+
+    # faded bilinear interpolation, same as perlin()
+    xcf = fade(xc)
+    ycf = fade(yc)
+    bilerp = v1*(1-xcf)*(1-ycf) + v2*(xcf)*(1-ycf) + v3*(1-xcf)*(ycf) + v4*(xcf)*(ycf)
+
+    return np.round(bilerp,4)
+
+# simplex noise (Ken Perlin's other noise algorithm, code is my own)
+#   https://weber.itn.liu.se/~stegu/simplexnoise/simplexnoise.pdf
+# the plane is split into triangles instead of squares, so each sample only uses
+# 3 corners, and there's no fade or bilinear interpolation: every corner just adds
+# its dot product, falling off with distance
+
+# skewing factors between (x,y) and the triangle grid
+SKEW = (math.sqrt(3) - 1)/2
+UNSKEW = (3 - math.sqrt(3))/6
+# scales the sum to the same [-0.707,0.707] range as perlin() for these gradients
+SIMPLEX_SCALE = 70
+
+def findSimplexGradient(x,y,gradients):
+    # like findGradient, but the triangle grid reaches further than the square one,
+    # so a finite grid wraps around instead of running out
+    if isinstance(gradients, GradientField):
+        return gradients.getGradient(x,y)
+    return gradients[y % len(gradients)][x % len(gradients[0])]
+
+def simplex(x,y,gradients):
+    # same call shape as perlin()
+
+    # finds which triangle (x,y) is in, and the distance vectors from its 3 corners
+    skew = (x + y)*SKEW
+    i, j = math.floor(x + skew), math.floor(y + skew)
+    unskew = (i + j)*UNSKEW
+    x0, y0 = x - (i - unskew), y - (j - unskew)
+
+    # lower triangle (corner at (1,0)) or upper triangle (corner at (0,1))
+    i1, j1 = (1, 0) if x0 > y0 else (0, 1)
+
+    corners = [(i, j, x0, y0),
+               (i + i1, j + j1, x0 - i1 + UNSKEW, y0 - j1 + UNSKEW),
+               (i + 1, j + 1, x0 - 1 + 2*UNSKEW, y0 - 1 + 2*UNSKEW)]
+
+    total = 0
+    for cornerX, cornerY, dx, dy in corners:
+        falloff = 0.5 - dx*dx - dy*dy
+        if falloff > 0:
+            gradient = findSimplexGradient(cornerX, cornerY, gradients)
+            total += falloff**4 * (gradient[0]*dx + gradient[1]*dy)
+
+    return round(SIMPLEX_SCALE*total,4)
+
+def findSimplexBatchGradients(xs,ys,gradients):
+    # vectorized findSimplexGradient
+    if isinstance(gradients, GradientField):
+        return gradients.getGradients(xs,ys)
+    gradientArray = np.asarray(gradients, dtype = float)
+    vectors = gradientArray[ys % gradientArray.shape[0], xs % gradientArray.shape[1]]
+    return vectors[...,0], vectors[...,1]
+
+def simplexBatch(xs,ys,gradients):
+    # simplex() for whole arrays of coordinates, same as perlinBatch is for perlin()
+    xs = np.asarray(xs, dtype = float)
+    ys = np.asarray(ys, dtype = float)
+
+    skew = (xs + ys)*SKEW
+    i, j = np.floor(xs + skew).astype(int), np.floor(ys + skew).astype(int)
+    unskew = (i + j)*UNSKEW
+    x0, y0 = xs - (i - unskew), ys - (j - unskew)
+
+    i1 = (x0 > y0).astype(int)
+    j1 = 1 - i1
+
+    corners = [(i, j, x0, y0),
+               (i + i1, j + j1, x0 - i1 + UNSKEW, y0 - j1 + UNSKEW),
+               (i + 1, j + 1, x0 - 1 + 2*UNSKEW, y0 - 1 + 2*UNSKEW)]
+
+    total = np.zeros(xs.shape)
+    for cornerX, cornerY, dx, dy in corners:
+        falloff = np.maximum(0.5 - dx*dx - dy*dy, 0)
+        gx, gy = findSimplexBatchGradients(cornerX, cornerY, gradients)
+        total += falloff**4 * (gx*dx + gy*dy)
+
+    return np.round(SIMPLEX_SCALE*total,4)
+
+# engine name -> (scalar function, batched function), for the engine = ... parameters
+ENGINES = {"perlin": (perlin, perlinBatch),
+           "simplex": (simplex, simplexBatch)}
+
+def noise(x,y,gradients,engine = "perlin"):
+    # perlin() or simplex(), picked by name
+    return ENGINES[engine][0](x,y,gradients)
+
+# fractal noise (fBm): several octaves of perlin noise added together
+#   octaves: how many layers of noise
+#   lacunarity: how much the frequency goes up each octave
+#   persistence: how much the amplitude goes down each octave
+# higher octaves sample far outside any finite grid, so use a GradientField for these
+
+def getOctaves(octaves,lacunarity,persistence):
+    # (frequency, amplitude) of each octave
+    return [(lacunarity**n, persistence**n) for n in range(octaves)]
+
+def fractalPerlin(x,y,gradients,octaves = 4,lacunarity = 2,persistence = 1/2,
+                  turbulence = False,engine = "perlin"):
+    # scalar (reference) fractal noise, one perlin() (or simplex()) call per octave
+    # the sum is divided by the total amplitude so the range stays the same as perlin()
+    # turbulence adds up the absolute values instead, which gives sharp creases
+    total = 0
+    amplitudeSum = 0
+    for frequency,amplitude in getOctaves(octaves,lacunarity,persistence):
+        value = noise(x*frequency,y*frequency,gradients,engine)
+        if turbulence: value = abs(value)
+        total += value*amplitude
+        amplitudeSum += amplitude
+    return round(total/amplitudeSum,4)
+
+def fractalPerlinBatch(xs,ys,gradients,octaves = 4,lacunarity = 2,persistence = 1/2,
+                       turbulence = False,engine = "perlin"):
+    # batched fractalPerlin: the octaves are stacked into one array and go through a
+    # single perlinBatch() call, so numpy loops over them instead of Python. nothing
+    # is shared between octaves, every octave of every sample still gets its own
+    # lattice lookup, fades and interpolation, so each extra octave costs about as
+    # much as one more perlinBatch() over the points
+    # (~2.5ms per octave for the 90x90 field main.py uses)
+    xs = np.asarray(xs, dtype = float)
+    ys = np.asarray(ys, dtype = float)
+
+    octaveList = getOctaves(octaves,lacunarity,persistence)
+    frequencies = np.array([frequency for frequency,_ in octaveList])
+    amplitudes = np.array([amplitude for _,amplitude in octaveList])
+
+    # one layer of coordinates per octave, stacked along a new first axis
+    shape = (octaves,) + (1,)*xs.ndim
+    batch = ENGINES[engine][1]
+    values = batch(xs*frequencies.reshape(shape), ys*frequencies.reshape(shape), gradients)
+    if turbulence: values = np.abs(values)
+
+    total = np.tensordot(amplitudes, values, axes = 1)
+    return np.round(total/amplitudes.sum(),4)
+
+# stencil evaluation: when 1/stepsize is a whole number n, every cell gets sampled at
+# the same n offsets, so the fades and distance vectors only depend on the offset.
+# those get worked out once per step size, and each cell is then just its 4 corner
+# gradients combined with the tables (no floor, mod, fade or per-sample lookups)
+
+stencils = dict() # n -> (offsets, 1 - offsets, faded offsets)
+
+def getStencilSize(stepsize):
+    # n if stepsize is 1/n for a whole number n, otherwise None
+    n = round(1/stepsize)
+    if n >= 1 and abs(n*stepsize - 1) < 1e-9:
+        return n
+    return None
+
+def getStencil(n):
+    if n not in stencils:
+        offsets = np.arange(n)/n
+        stencils[n] = (offsets, 1 - offsets, fade(offsets))
+    return stencils[n]
+
+def perlinStencil(xstart,xcount,ystart,ycount,n,gradients):
+    # the same values as perlinBatch() at x = i/n, y = j/n
+    # for i in [xstart, xstart+xcount) and j in [ystart, ystart+ycount)
+    # (rows go along x and columns go along y, like generatePerlinArray)
+    offsets, distances, fades = getStencil(n)
+
+    # every lattice point touched, plus one more for the far corners
+    cellX0, cellX1 = xstart//n, (xstart + xcount - 1)//n
+    cellY0, cellY1 = ystart//n, (ystart + ycount - 1)//n
+    latticeX, latticeY = np.meshgrid(np.arange(cellX0, cellX1 + 2),
+                                     np.arange(cellY0, cellY1 + 2), indexing = "ij")
+    gx, gy = findBatchGradients(latticeX, latticeY, gradients)
+
+    # corner gradients of each cell, shaped (cellX, 1, cellY, 1) to broadcast
+    # against the offset tables shaped (1, n, 1, 1) along x and (1, 1, 1, n) along y
+    def corner(dx, dy):
+        cornerX = gx[dx:gx.shape[0]-1+dx, dy:gx.shape[1]-1+dy]
+        cornerY = gy[dx:gy.shape[0]-1+dx, dy:gy.shape[1]-1+dy]
+        return cornerX[:,None,:,None], cornerY[:,None,:,None]
+    xo, dxo, fx = [table[None,:,None,None] for table in (offsets, distances, fades)]
+    yo, dyo, fy = [table[None,None,None,:] for table in (offsets, distances, fades)]
+
+    # dot products with the distance vectors (see findDistanceVectors)
+    g1x, g1y = corner(0,0)
+    g2x, g2y = corner(1,0)
+    g3x, g3y = corner(0,1)
+    g4x, g4y = corner(1,1)
+    v1 = g1x*xo + g1y*yo
+    v2 = g2x*dxo + g2y*yo
+    v3 = g3x*xo + g3y*dyo
+    v4 = g4x*dxo + g4y*dyo
+
+    # same faded bilinear interpolation as perlin(), written as 3 lerps
+    top = v1 + fx*(v2 - v1)
+    bottom = v3 + fx*(v4 - v3)
+    block = top + fy*(bottom - top)
+
+    # (cellX, n, cellY, n) -> one sample per row/column, then cut out the requested part
+    block = block.reshape(block.shape[0]*n, block.shape[2]*n)
+    rowStart, colStart = xstart - cellX0*n, ystart - cellY0*n
+    return np.round(block[rowStart:rowStart+xcount, colStart:colStart+ycount],4)
+
+def generatePerlinArray(xmax,ymax,stepsize,gradients,octaves = 1,lacunarity = 2,persistence = 1/2,
+                        engine = "perlin"):
+    # generates a 2D array filled with perlin noise (fractal noise if octaves > 1)
+    # (or simplex noise with engine = "simplex")
+    # uses the batched version if numpy is installed, otherwise one perlin() call per cell
+    if np is None:
+        return generatePerlinArrayScalar(xmax,ymax,stepsize,gradients,
+                                         octaves,lacunarity,persistence,engine)
+
+    xcount = int(xmax/stepsize)
+    ycount = int(ymax/stepsize)
+
+    # sample i (starting at 1) is at x = i/n, which the stencil version can do directly
+    n = getStencilSize(stepsize)
+    if engine == "perlin" and octaves == 1 and n is not None:
+        return perlinStencil(1,xcount,1,ycount,n,gradients).tolist()
+
+    # same sample coordinates as generatePerlinArrayScalar
+    xs = np.round(np.arange(xcount)*stepsize + stepsize, 5)
+    ys = np.round(np.arange(ycount)*stepsize + stepsize, 5)
+
+    # rows go along x and columns go along y, just like the scalar version
+    xgrid, ygrid = np.meshgrid(xs, ys, indexing = "ij")
+    if octaves > 1:
+        return fractalPerlinBatch(xgrid,ygrid,gradients,octaves,lacunarity,persistence,
+                                  engine = engine).tolist()
+    return ENGINES[engine][1](xgrid,ygrid,gradients).tolist()
+
+def generatePerlinArrayScalar(xmax,ymax,stepsize,gradients,octaves = 1,lacunarity = 2,persistence = 1/2,
+                              engine = "perlin"):
+    # generates a 2D array filled with perlin noise, one perlin() call at a time
+    # (the reference version of generatePerlinArray)
     
     xcount = int(xmax/stepsize)
     ycount = int(ymax/stepsize)
@@ -161,7 +491,11 @@ def generatePerlinArray(xmax,ymax,stepsize,gradients):
         
         for y in [round(y*stepsize + stepsize,5) for y in range(ycount)]:
 
-            value = perlin(x,y,gradients)
+            if octaves > 1:
+                value = fractalPerlin(x,y,gradients,octaves,lacunarity,persistence,
+                                      engine = engine)
+            else:
+                value = noise(x,y,gradients,engine)
             results[row][col] = value
 
             col += 1
@@ -170,21 +504,149 @@ def generatePerlinArray(xmax,ymax,stepsize,gradients):
     return results
 
 
+def perlin1D(x,gradients):
+    # 1D perlin noise, same idea as perlin() with a slope instead of a gradient vector
+    # at each lattice point, and the (faded) interpolation between the 2 ends of the cell
+    # gradients has to be a GradientField
+    x0 = math.floor(x)
+    xc = x - x0
+
+    v0 = gradients.getSlope(x0)*xc
+    v1 = gradients.getSlope(x0+1)*(xc-1)
+
+    xcf = fade(xc)
+    # raw 1D noise is in [-0.5,0.5], scaled to the [-0.707,0.707] range of perlin()
+    return (v0*(1-xcf) + v1*xcf)*sqrt2
+
+def fractalPerlin1D(x,gradients,octaves = 1,lacunarity = 2,persistence = 1/2):
+    # fractalPerlin for perlin1D
+    total = 0
+    amplitudeSum = 0
+    for frequency,amplitude in getOctaves(octaves,lacunarity,persistence):
+        total += perlin1D(x*frequency,gradients)*amplitude
+        amplitudeSum += amplitude
+    return total/amplitudeSum
+
+class TerrainStream:
+    # endless stream of 1D noise values, one per platform (use next(stream))
+    # platforms are spacing pixels apart and one lattice cell is scale pixels wide,
+    # so each value is O(1) and nothing is precomputed
+    # the same seed always gives the same heights
+
+    def __init__(self, seed = None, spacing = 400, scale = 4000, octaves = 1):
+        self.gradients = GradientField(seed)
+        self.seed = self.gradients.seed
+        self.step = spacing/scale
+        self.octaves = octaves
+        self.index = 0 # how many values have been used so far
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        value = fractalPerlin1D(self.index*self.step, self.gradients, self.octaves)
+        self.index += 1
+        return value
+
+
+class NoiseChunkCache(MvcExempt):
+    # an endless perlin noise field that's generated in square chunks as it's needed
+    # value (row,col) is the noise at (row*stepSize, col*stepSize), same layout as
+    # generatePerlinArray (rows go along x, columns go along y)
+
+    # chunks are kept in least-recently-used order, and once there are more than
+    # maxChunks the oldest one is thrown out, so memory stays flat however far you go
+
+    # the lock lets a background thread fill in chunks while the game loop reads them
+
+    def __init__(self, seed = None, chunkSize = 32, stepSize = 1/10, octaves = 1, maxChunks = 16):
+        self.gradients = GradientField(seed)
+        self.seed = self.gradients.seed
+        self.chunkSize = chunkSize
+        self.stepSize = stepSize
+        self.octaves = octaves
+        self.maxChunks = maxChunks
+
+        self.chunks = OrderedDict() # (seed, chunkX, chunkY) -> list of rows
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+
+    def generateChunk(self, chunkX, chunkY):
+        size = self.chunkSize
+        row0, col0 = chunkX*size, chunkY*size
+        n = getStencilSize(self.stepSize)
+
+        if np is None:
+            return [[fractalPerlin((row0+row)*self.stepSize, (col0+col)*self.stepSize,
+                                   self.gradients, self.octaves)
+                     for col in range(size)] for row in range(size)]
+
+        if self.octaves == 1 and n is not None:
+            return perlinStencil(row0, size, col0, size, n, self.gradients).tolist()
+
+        xs = (row0 + np.arange(size))*self.stepSize
+        ys = (col0 + np.arange(size))*self.stepSize
+        xgrid, ygrid = np.meshgrid(xs, ys, indexing = "ij")
+        return fractalPerlinBatch(xgrid, ygrid, self.gradients, self.octaves).tolist()
+
+    def getChunk(self, chunkX, chunkY):
+        key = (self.seed, chunkX, chunkY)
+        with self.lock:
+            chunk = self.chunks.get(key)
+            if chunk is not None:
+                self.hits += 1
+                self.chunks.move_to_end(key)
+                return chunk
+
+        # generated without the lock, so other threads can still look up the chunks
+        # that are already there in the meantime
+        chunk = self.generateChunk(chunkX, chunkY)
+
+        with self.lock:
+            if key in self.chunks:
+                # another thread made it first (it's the same chunk either way)
+                self.hits += 1
+                self.chunks.move_to_end(key)
+                return self.chunks[key]
+            self.misses += 1
+            self.chunks[key] = chunk
+            if len(self.chunks) > self.maxChunks:
+                self.chunks.popitem(last = False)
+                self.evictions += 1
+            return chunk
+
+    def getValue(self, row, col):
+        size = self.chunkSize
+        chunk = self.getChunk(row // size, col // size)
+        return chunk[row % size][col % size]
+
+    def getRow(self, row, col, count):
+        # count values of a row starting at col (one chunk lookup per chunk, not per value)
+        size = self.chunkSize
+        values = []
+        while len(values) < count:
+            chunk = self.getChunk(row // size, col // size)
+            start = col % size
+            end = min(size, start + count - len(values))
+            values.extend(chunk[row % size][start:end])
+            col += end - start
+        return values
+
+    def getStats(self):
+        return {"chunks": len(self.chunks), "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
 def getCellColorGrayscale(row,col,array):
 
     # retrieves the color value of a perlin array cell (-1 = black,  1 = white)
-    # adds 1 to shift it the range to [0,2]
+    # adds 1 to shift it the range to [0,2], then looks it up in a palette (see colormap.py)
     value = array[row][col] + 1
-
-    # multiply value by 255 to get a decimal value
-    # the ":02x" foces this value to be a hex (requires int)
-    # then, since it's a string, multiply it by 3 to make it fill all R, G, and B values
-
-    return "#" + f"{int(value*127.5):02X}"*3
+    return colormap.getColor(value, colormap.GRAYSCALE)
 
 def getCellColorBlue(value):
     # see getCellColorGrayscale for explanation
-    return "#00" + f"{int(value*127.5):02X}"*2
+    return colormap.getColor(value, colormap.BLUE)
 
 
 
@@ -208,32 +670,187 @@ def getCellBounds(app, row, col):
 
 def drawBoard(app, canvas):
     for row in range(app.rows):
+        # the whole row's colors at once (same as getCellColorGrayscale)
+        colors = colormap.mapColors(app.perlinArray[row], colormap.GRAYSCALE, -1, 1)
         for col in range(app.cols):
             (x0, y0, x1, y1) = getCellBounds(app, row, col)
             canvas.create_rectangle(x0, y0, x1, y1, width = 0,
-            fill = getCellColorGrayscale(row,col,app.perlinArray))
-
-def generate2DPerlinArray(rows,cols,stepSize):
-    rows = 10
-    cols = 10
-    stepSize = 1/10
-
-    gradients = generateGrid(rows+1,cols+1)
-    return generatePerlinArray(rows-1,cols-1, stepSize, gradients)
+            fill = colors[col])
+
+# noise atlas: a noise array saved to a binary file so it doesn't need regenerating
+#   header: magic, version, octaves, seed, rows, cols, stepSize (little endian)
+#   then rows*cols float32 values, row by row
+ATLAS_MAGIC = b"NGNA"
+ATLAS_VERSION = 1
+ATLAS_HEADER = struct.Struct("<4sHHQIId")
+ATLAS_FOLDER = "atlases" # where the demo below keeps them
+
+class NoiseAtlas:
+    # a saved noise array, memory mapped instead of read in, so only the rows that
+    # actually get used are loaded from disk (atlas[row][col], like a 2D list)
+    # rows are memoryview slices of the file, nothing gets copied
+    # the file stays open (and mapped) until close(), or the end of a with block, and
+    # rows taken from the atlas can't be used after that
+    __slots__ = ("seed", "octaves", "rows", "cols", "stepSize", "file", "map", "values")
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        if len(self.map) < ATLAS_HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a noise atlas")
+        magic, version, self.octaves, self.seed, self.rows, self.cols, self.stepSize = \
+            ATLAS_HEADER.unpack_from(self.map)
+        if (magic != ATLAS_MAGIC or version != ATLAS_VERSION or
+            len(self.map) != ATLAS_HEADER.size + 4*self.rows*self.cols):
+            self.close()
+            raise ValueError(f"{path} is not a noise atlas")
+
+        self.values = memoryview(self.map)[ATLAS_HEADER.size:].cast("f")
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, row):
+        if row < 0 or row >= self.rows:
+            raise IndexError("atlas row out of range")
+        return self.values[row*self.cols:(row+1)*self.cols]
+
+    def matches(self, seed, stepSize, octaves, rows, cols):
+        return (self.seed == seed and self.stepSize == stepSize and self.octaves == octaves
+                and self.rows == rows and self.cols == cols)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def close(self):
+        # (safe to call more than once)
+        if getattr(self, "values", None) is not None:
+            self.values.release()
+            self.values = None
+        self.map.close()
+        self.file.close()
+
+def isAtlasSeed(seed):
+    # the header only has room for seeds that are ints from 0 to 2**64 - 1
+    return isinstance(seed, int) and not isinstance(seed, bool) and 0 <= seed < 2**64
+
+def saveAtlas(path, noiseArray, seed, stepSize, octaves = 1):
+    # writes a 2D noise array (list of rows) to path as a noise atlas
+    if not isAtlasSeed(seed):
+        raise ValueError(f"can't save seed {seed!r} in a noise atlas")
+    rows, cols = len(noiseArray), len(noiseArray[0])
+    values = array.array("f")
+    for row in noiseArray:
+        values.extend(row)
+    if sys.byteorder != "little":
+        values.byteswap()
+
+    # written next to path and then swapped in, since a NoiseAtlas loaded from the
+    # old file may still have it mapped (rewriting it in place would change or
+    # truncate the memory under it)
+    temp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp, "wb") as f:
+            f.write(ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, octaves, seed,
+                                      rows, cols, stepSize))
+            values.tofile(f)
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+def loadAtlas(path):
+    return NoiseAtlas(path)
+
+def generate2DPerlinArray(rows,cols,stepSize,seed = None,octaves = 1,atlasPath = None):
+    # rows x cols lattice cells, sampled every stepSize
+    # the same seed always gives the same array (no seed = random terrain)
+
+    # with a seed and an atlasPath, a matching atlas file is loaded instead of computing,
+    # and if there isn't one the array is saved there for next time. either way a
+    # NoiseAtlas comes back (so the values are float32 both times), which has to be
+    # closed when it's not needed anymore
+    # (seeds that don't fit in an atlas, see isAtlasSeed, just skip the atlas)
+    xcount = int((rows-1)/stepSize)
+    ycount = int((cols-1)/stepSize)
+    useAtlas = atlasPath is not None and isAtlasSeed(seed)
+
+    if useAtlas and os.path.exists(atlasPath):
+        try:
+            atlas = loadAtlas(atlasPath)
+            if atlas.matches(seed, stepSize, octaves, xcount, ycount):
+                return atlas
+            atlas.close()
+        except ValueError:
+            pass # not an atlas (or an old one), just make a new one
+
+    gradients = GradientField(seed)
+    noiseArray = generatePerlinArray(rows-1,cols-1, stepSize, gradients, octaves)
+    if useAtlas:
+        saveAtlas(atlasPath, noiseArray, seed, stepSize, octaves)
+        return loadAtlas(atlasPath)
+    return noiseArray
+
+def benchmarkEngines(count = 100000, seed = 0):
+    # samples per second of each engine, scalar and batched (if numpy is installed)
+    # run with: python -c "import perlin; perlin.benchmarkEngines()"
+    gradients = GradientField(seed)
+    rng = random.Random(seed)
+    points = [(rng.uniform(0,100), rng.uniform(0,100)) for _ in range(count)]
+
+    results = dict()
+    for name,(scalar,batch) in ENGINES.items():
+        scalarPoints = points[:count//10] # the scalar versions are a lot slower
+        start = time.perf_counter()
+        for x,y in scalarPoints:
+            scalar(x,y,gradients)
+        results[(name, "scalar")] = len(scalarPoints)/(time.perf_counter() - start)
+
+        if np is not None:
+            xs = np.array([x for x,_ in points])
+            ys = np.array([y for _,y in points])
+            start = time.perf_counter()
+            batch(xs,ys,gradients)
+            results[(name, "batch")] = count/(time.perf_counter() - start)
+
+    for (name,kind),rate in results.items():
+        print(f"{name:>8} {kind:>6}: {rate:>12,.0f} samples/s")
+    return results
 
 def redrawAll(app,canvas): 
     drawBoard(app,canvas)
 
+# with a seed (python perlin.py 5) the demo keeps its noise in an atlas in
+# ATLAS_FOLDER, so it only gets generated the first time
+demoSeed = None
+
 def appStarted(app):
 
-    app.perlinArray = generate2DPerlinArray(10,10, 1/10)
+    atlasPath = None
+    if demoSeed is not None:
+        os.makedirs(ATLAS_FOLDER, exist_ok = True)
+        atlasPath = os.path.join(ATLAS_FOLDER, f"{demoSeed}.ngna")
+    app.perlinArray = generate2DPerlinArray(10,10, 1/10, demoSeed, atlasPath = atlasPath)
 
     app.margin = 5
     app.rows = len(app.perlinArray)
     app.cols = len(app.perlinArray[0])
 
 
+def appStopped(app):
+    if isinstance(app.perlinArray, NoiseAtlas):
+        app.perlinArray.close()
+
 def main():
+    global demoSeed
+    if len(sys.argv) > 1:
+        demoSeed = int(sys.argv[1])
     runApp(width = 600, height = 600)
 
 if __name__ == "__main__":
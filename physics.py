@@ -1,44 +1,106 @@
 from cmu_112_graphics import *
 import math
+import time
+import array
+import colliders
 
 # Player and Object classes and physics calculations
 
+# everything is in pixels and seconds, and the physics runs in fixed steps of TICK
+# seconds (the original per-tick numbers were tuned for 100 ticks a second)
+TICK = 1/100
+
 # class for player
 class Player:
-    def __init__(self,pos,size):
+    def __init__(self,pos,size,collider = None):
         self.x, self.y = pos[0], pos[1] # coords of the bottom left corner of the box
         self.vx, self.vy = 0,0
         self.ax, self.ay = 0,0
 
-        self.terminalVelocity = 20
-        self.gravity = 1/10
+        self.terminalVelocity = 2000 # pixels/second, gravity won't make you fall faster
+        self.gravity = 1000 # pixels/second^2
 
-        # fractions representing what percent of velocity is remaining after collisions
+        # fraction of the speed into a surface that bounces back after a collision
         self.collisionElasticity = 1/5
-        self.friction = 1/10
+        # how fast sliding along a surface slows you down: speed along the surface
+        # is multiplied by e^(-friction*seconds) while touching it (1/10 lost every tick)
+        self.friction = -math.log(1 - 1/10)/TICK
 
         self.size = size
+        # shape it collides as (see colliders.py), a size x size box by default
+        self.collider = collider if collider is not None else colliders.getSquare(size)
+
+        # sleeping: sitting still on a platform, so updatePosition can skip the physics
+        # (gravity pushing it into the platform and getting pushed back out every tick)
+        # until something wakes it: a launch, being moved, or the platforms changing
+        self.sleeping = False
+        self.sleepSpeed = 5 # pixels/second, slower than this counts as still
+        self.sleepTicks = 10 # steps it has to stay still and supported to fall asleep
+        self.stillTicks = 0
+        self.sleepVersion = None # getObjectsVersion when it fell asleep
     
     def drawPlayer(self, canvas, scroll = 0, image = None):
         if image:
-            canvas.create_image(self.x + self.size/2 - scroll, self.y - self.size/2, image=ImageTk.PhotoImage(image))
-        else: canvas.create_rectangle(self.x, self.y, 
-                self.x + self.size, self.y - self.size, fill = "cyan")
+            canvas.create_image(self.x + self.size/2 - scroll, self.y - self.size/2, pilImage=image)
+        elif colliders.isBox(self.collider):
+            canvas.create_rectangle(self.x - scroll, self.y,
+                self.x + self.size - scroll, self.y - self.size, fill = "cyan")
+        else:
+            colliders.drawCollider(canvas, self.collider, self.x - scroll, self.y, fill = "cyan")
 
     def getPosition(self):
         return self.x, self.y
+
+    def getCollider(self):
+        return self.collider
+
+    def getBox(self):
+        # bounding box (left, top, right, bottom) of the collider where it is now
+        left, top, right, bottom = self.collider.bounds
+        return (self.x + left, self.y + top, self.x + right, self.y + bottom)
     
     def getSize(self):
         return self.size
 
     def getVelocity(self):
-        return self.vx, self.vys
+        return self.vx, self.vy
 
     def setPosition(self,pos):
         self.x, self.y = pos[0], pos[1]
+        self.wake()
     
     def setVelocity(self,pos):
         self.vx, self.vy = pos[0], pos[1]
+        self.wake()
+
+    def wake(self):
+        self.sleeping = False
+        self.stillTicks = 0
+
+    def isSupported(self, app):
+        # if the player is sitting on top of a platform (or solid ground)
+        left, top, right, bottom = getBox(self)
+        heightfield = getattr(app, "heightfield", None)
+        if heightfield is not None and heightfield.solid:
+            if abs(heightfield.getDepth(self.collider, self.x, self.y)[0]) < 1:
+                return True
+        for object in getNearbyObjects(app, left, bottom - 1, right, bottom + 1):
+            otherLeft, otherTop, otherRight, otherBottom = getBox(object)
+            if abs(otherTop - bottom) < 1 and left < otherRight and right > otherLeft:
+                return True
+        return False
+
+    def updateSleep(self, app):
+        # falls asleep after sleepTicks steps of barely moving while on a platform
+        if (abs(self.vx) < self.sleepSpeed and abs(self.vy) < self.sleepSpeed and
+            self.isSupported(app)):
+            self.stillTicks += 1
+        else:
+            self.stillTicks = 0
+        if self.stillTicks >= self.sleepTicks:
+            self.sleeping = True
+            self.vx, self.vy = 0, 0
+            self.sleepVersion = getObjectsVersion(app)
     
     def getScore(self):
         if self.x < 0: 
@@ -46,87 +108,179 @@ class Player:
         else:
             return int(self.x * math.log(self.x)) - 460
     
-    def updatePosition(self,app):
-        # runs every game tick - updates player position, velocity, etc.
+    def getFriction(self, dt):
+        # fraction of the speed along a surface that's lost over dt seconds of contact
+        return 1 - math.exp(-self.friction*dt)
+
+    def updatePosition(self,app,dt = TICK):
+        # runs every physics step - moves the player forward dt seconds
+        if self.sleeping:
+            if getObjectsVersion(app) == self.sleepVersion:
+                return
+            # a platform changed, it might have been the one holding the player up
+            self.wake()
 
         self.ay = self.gravity
 
-        self.vx += self.ax
-        self.vy += self.ay
-
-        if self.vy > self.terminalVelocity or self.vy < -self.terminalVelocity:
-            self.ay = 0
-
-        self.x += self.vx
-        self.y += self.vy
-
-        self.objectCollisionUpdate(app)
+        self.vx += self.ax*dt
+        # gravity stops speeding you up at terminal velocity (but doesn't slow you down)
+        if self.vy < self.terminalVelocity:
+            self.vy = min(self.vy + self.ay*dt, self.terminalVelocity)
+
+        self.moveAndCollide(app,dt)
+        self.objectCollisionUpdate(app,dt)
+        self.heightfieldUpdate(app,dt)
+        self.updateSleep(app)
+
+    def moveAndCollide(self,app,dt,maxHits = 3):
+        # moves the player dt seconds, stopping at the first object it would hit on the way
+        # (swept AABB), bouncing off it, and moving on with the rest of the time.
+        # unlike checking for overlaps after moving, this can't skip through an object
+        # or push out the wrong side, however fast the player is going
+        # (only boxes against boxes: circles and polygons just move, and get pushed
+        # out of things afterwards in objectCollisionUpdate)
+        remaining = 1 # fraction of dt left to move
+        if not colliders.isBox(self.collider):
+            self.x += self.vx*dt
+            self.y += self.vy*dt
+            return
+
+        for _ in range(maxHits):
+            dx, dy = self.vx*dt*remaining, self.vy*dt*remaining
+            box = getBox(self)
+            left, top, right, bottom = box
+
+            # everything the box could touch on the way
+            nearbyObjects = getNearbyObjects(app, min(left, left + dx), min(top, top + dy),
+                                             max(right, right + dx), max(bottom, bottom + dy))
+            firstHit = None
+            for object in nearbyObjects:
+                if not colliders.isBox(object.getCollider()):
+                    continue
+                hit = sweptAABB(box, dx, dy, object.getBox())
+                if hit is not None and (firstHit is None or hit[0] < firstHit[0]):
+                    firstHit = hit
+
+            if firstHit is None:
+                self.x += dx
+                self.y += dy
+                return
+
+            # move up to the object, then bounce off it
+            timeOfImpact, normalx, normaly = firstHit
+            self.x += dx*timeOfImpact
+            self.y += dy*timeOfImpact
+            self.bounce(normalx, normaly, dt)
+            remaining *= 1 - timeOfImpact
+
+        # ran out of hits this step, the rest of the movement is dropped
+
+    def bounce(self,normalx,normaly,dt):
+        # bounces the player off a surface with the (unit) normal (normalx, normaly)
+        # same math as the end of objectCollisionUpdate
+        collisionspeed = self.vx*normalx + self.vy*normaly
+
+        collisionx = normalx*collisionspeed
+        collisiony = normaly*collisionspeed
+
+        tangentx = self.vx - collisionx
+        tangenty = self.vy - collisiony
+
+        friction = self.getFriction(dt)
+        self.vx = self.vx - collisionx*(1+self.collisionElasticity) - tangentx*friction
+        self.vy = self.vy - collisiony*(1+self.collisionElasticity) - tangenty*friction
         
-    def objectCollisionUpdate(self,app):
+    def objectCollisionUpdate(self,app,dt = TICK):
         # checks for collisions with game objects and updates player data
+        # (after moveAndCollide, this only pushes the player out of objects it's already
+        # inside of, like after a reset, so touching doesn't count as overlapping)
 
         # I wrote most of this code myself, but used this guide to fix some bugs and logical errors
         # https://2dengine.com/?p=collisions
 
-        selfLeftWall = self.x
-        selfRightWall = self.x + self.size
-
-        selfBottomWall = self.y 
-        selfTopWall = self.y - self.size
+        # boxes against boxes are done by hand below, anything with a circle or polygon
+        # goes through colliders.collide (separating axis theorem). either way the
+        # bounding boxes are checked first, which rules out almost everything
 
-        cx,cy = self.x + self.size/2, self.y - self.size/2
+        selfLeftWall, selfTopWall, selfRightWall, selfBottomWall = getBox(self)
+        selfIsBox = colliders.isBox(self.collider)
+        if selfIsBox:
+            width, height = self.collider.width, self.collider.height
+            cx,cy = self.x + width/2, self.y - height/2
 
-        for object in app.objects:
+        nearbyObjects = getNearbyObjects(app, selfLeftWall, selfTopWall, selfRightWall, selfBottomWall)
+        for object in nearbyObjects:
             x,y = object.getPosition()
-            size = object.getSize()
+            collider = object.getCollider()
+            left, top, right, bottom = collider.bounds
+            objectLeftWall, objectTopWall = x + left, y + top
+            objectRightWall, objectBottomWall = x + right, y + bottom
+
+            if not (selfRightWall > objectLeftWall and selfLeftWall < objectRightWall
+                    and selfTopWall < objectBottomWall and selfBottomWall > objectTopWall):
+                continue
+
+            if not (selfIsBox and colliders.isBox(collider)):
+                hit = colliders.collide(self.collider, self.x, self.y, collider, x, y)
+                if hit is not None:
+                    normalx, normaly, depth = hit
+                    self.x += normalx*depth
+                    self.y += normaly*depth
+                    self.bounce(normalx, normaly, dt)
+                continue
+
+            objcx,objcy = x + collider.width/2, y - collider.height/2
+
+            # distance vector
+            distancex = cx - objcx
+            distancey = cy - objcy
+
+            # seperation vector
+            if abs(distancex) > abs(distancey):
+                seperationx, seperationy = width/2 + collider.width/2 - abs(distancex), 0
+            else:
+                seperationx, seperationy = 0, height/2 + collider.height/2 - abs(distancey)
+
+            if distancex < 0:
+                seperationx *= -1
+            if distancey < 0:
+                seperationy *= -1
+            
+            # normal vector
+            dist = math.sqrt(seperationx**2 + seperationy**2) + 0.001 #don't divide by 0
+            normalx = seperationx/dist
+            normaly = seperationy/dist
+
+            # speed parallel and tangent to the collision
+            collisionspeed = self.vx*normalx + self.vy*normaly
+
+            collisionx = normalx*collisionspeed
+            collisiony = normaly*collisionspeed
 
-            objectLeftWall = x
-            objectRightWall = x + size
+            tangentx = self.vx - collisionx
+            tangenty = self.vy - collisiony
 
-            objectBottomWall = y
-            objectTopWall = y - size
+            # move the player
+            self.x += seperationx
+            self.y += seperationy
 
-            objcx,objcy = x + size/2, y - size/2
+            friction = self.getFriction(dt)
+            self.vx = self.vx - collisionx*(1+self.collisionElasticity) - tangentx*friction
+            self.vy = self.vy - collisiony*(1+self.collisionElasticity) - tangenty*friction
             
-            if (selfRightWall >= objectLeftWall and selfLeftWall <= objectRightWall
-                 and selfTopWall <= objectBottomWall and selfBottomWall >= objectTopWall):
-
-                # distance vector
-                distancex = cx - objcx
-                distancey = cy - objcy
-
-                # seperation vector
-                if abs(distancex) > abs(distancey):
-                    seperationx, seperationy = self.size/2 + size/2 - abs(distancex), 0
-                else:
-                    seperationx, seperationy = 0, self.size/2 + size/2 - abs(distancey)
-
-                if distancex < 0:
-                    seperationx *= -1
-                if distancey < 0:
-                    seperationy *= -1
-                
-                # normal vector
-                dist = math.sqrt(seperationx**2 + seperationy**2) + 0.001 #don't divide by 0
-                normalx = seperationx/dist
-                normaly = seperationy/dist
-
-                # speed parallel and tangent to the collision
-                collisionspeed = self.vx*normalx + self.vy*normaly
-
-                collisionx = normalx*collisionspeed
-                collisiony = normaly*collisionspeed
-
-                tangentx = self.vx - collisionx
-                tangenty = self.vy - collisiony
-
-                # move the player
-                self.x += seperationx
-                self.y += seperationy
-
-                self.vx = self.vx - collisionx*(1+self.collisionElasticity) - tangentx*self.friction
-                self.vy = self.vy - collisiony*(1+self.collisionElasticity) - tangenty*self.friction
-                
+    def heightfieldUpdate(self,app,dt = TICK):
+        # pushes the player back up out of app.heightfield (solid ground that goes on
+        # forever, see colliders.Heightfield), and bounces it off the slope there
+        heightfield = getattr(app, "heightfield", None)
+        if heightfield is None or not heightfield.solid:
+            return
+        hit = heightfield.collide(self.collider, self.x, self.y)
+        if hit is not None:
+            normalx, normaly, depth = hit
+            # straight up, so standing on a slope doesn't slide the player sideways
+            self.y -= depth
+            self.bounce(normalx, normaly, dt)
+
     def collisionUpdate(self,app):
         # checks for collisions with borders and updates player data (OLD, NO LONGER USED)
 
@@ -139,32 +293,36 @@ class Player:
         if leftWall <= app.margin:
             self.x = app.margin
             self.vx = -(self.vx * self.collisionElasticity) 
-            self.vy = (self.vy * self.friction/3)
+            self.vy = (self.vy * self.getFriction(TICK)/3)
         elif rightWall >= app.width - app.margin:
             self.x = app.width - app.margin - self.size
             self.vx = -(self.vx * self.collisionElasticity) 
-            self.vy = (self.vy * self.friction/3)
+            self.vy = (self.vy * self.getFriction(TICK)/3)
 
         if topWall <= app.margin:
             self.y = app.margin + self.size
             self.vy = -(self.vy * self.collisionElasticity) 
-            self.vx = (self.vx * self.friction/3)
+            self.vx = (self.vx * self.getFriction(TICK)/3)
         elif bottomWall >= app.height - app.margin:
             self.y = app.height - app.margin
             self.vy = -(self.vy * self.collisionElasticity) 
-            self.vx = (self.vx * self.friction/3)
+            self.vx = (self.vx * self.getFriction(TICK)/3)
 
     def updateVelocity(self, app):
         # updates velocity after user launches the player 
+        # (pixels/second for every pixel dragged)
         x1,y1,x2,y2 = app.vector
-        self.vx += (x1-x2) / 50
-        self.vy += (y1-y2) / 30
+        self.vx += (x1-x2) * 2
+        self.vy += (y1-y2) * 10/3
         app.vector = None
+        self.wake()
 
 class Object:
-    def __init__(self,x,y,size):
+    def __init__(self,x,y,size,collider = None):
         self.x,self.y = x,y #bottom left corner
         self.size = size
+        # size x size box unless it's given another shape (see colliders.py)
+        self.collider = collider if collider is not None else colliders.getSquare(size)
     
     def getPosition(self):
         return self.x, self.y
@@ -172,35 +330,545 @@ class Object:
     def getSize(self):
         return self.size
 
+    def getCollider(self):
+        return self.collider
+
+    def getBox(self):
+        # bounding box (left, top, right, bottom) of the collider where it is now
+        left, top, right, bottom = self.collider.bounds
+        return (self.x + left, self.y + top, self.x + right, self.y + bottom)
+
     def setPosition(self,pos):
         self.x,self.y = pos[0], pos[1]
 
+# swept AABB collisions, using the idea from
+#   https://www.gamedev.net/tutorials/programming/general-and-gameplay-programming/swept-aabb-collision-detection-and-response-r3084/
+# boxes are (left, top, right, bottom)
+
+def getBox(object):
+    # the bounding box of the object's collider (Player, Object and PlatformView
+    # each work it out the quickest way they can)
+    return object.getBox()
+
+def getAxisTimes(selfMin, selfMax, otherMin, otherMax, d):
+    # fractions of a move d along one axis where the two ranges start and stop overlapping
+    # (None if they never overlap)
+    if d > 0:
+        return (otherMin - selfMax)/d, (otherMax - selfMin)/d
+    elif d < 0:
+        return (otherMax - selfMin)/d, (otherMin - selfMax)/d
+    elif selfMax <= otherMin or selfMin >= otherMax:
+        return None
+    else:
+        return -math.inf, math.inf
+
+def sweptAABB(box, dx, dy, other):
+    # when box, moving by (dx,dy), first runs into other
+    # returns (time of impact from 0 to 1, normalx, normaly), or None if it doesn't
+    left, top, right, bottom = box
+    otherLeft, otherTop, otherRight, otherBottom = other
+
+    xTimes = getAxisTimes(left, right, otherLeft, otherRight, dx)
+    yTimes = getAxisTimes(top, bottom, otherTop, otherBottom, dy)
+    if xTimes is None or yTimes is None:
+        return None
+
+    entry = max(xTimes[0], yTimes[0])
+    exit = min(xTimes[1], yTimes[1])
+    # (a tiny bit below 0 is rounding error from stopping exactly at the last contact)
+    if entry >= exit or entry < -1e-9 or entry > 1:
+        return None
+
+    # the axis that started overlapping last is the side that got hit
+    if xTimes[0] > yTimes[0]:
+        return max(0, entry), (-1 if dx > 0 else 1), 0
+    else:
+        return max(0, entry), 0, (-1 if dy > 0 else 1)
+
+class FixedTimestep:
+    # runs the physics in fixed steps of dt seconds, no matter how often (or how late)
+    # timerFired actually gets called: real time is added to an accumulator and as many
+    # whole steps as fit are run, so the game speed doesn't depend on the frame rate
+
+    # each step can be split into substeps, and at most maxSteps get run per update
+    # (if the game falls further behind than that, the extra time is dropped so it
+    # doesn't spend every frame catching up)
+    def __init__(self, dt = TICK, substeps = 1, maxSteps = 10):
+        self.dt = dt
+        self.substeps = substeps
+        self.maxSteps = maxSteps
+        self.accumulator = 0
+        self.lastTime = None
+        self.ticks = 0 # total steps so far
+
+    def advance(self, elapsed, step):
+        # adds elapsed seconds, and calls step(seconds) once per substep
+        # returns how many steps were run
+        self.accumulator += elapsed
+        steps = 0
+        while self.accumulator >= self.dt and steps < self.maxSteps:
+            self.step(step)
+            self.accumulator -= self.dt
+            steps += 1
+        if steps == self.maxSteps:
+            self.accumulator %= self.dt
+        return steps
+
+    def step(self, step):
+        # runs exactly one step, without touching the accumulator (for running
+        # the game without real time, ex: headless.py)
+        for _ in range(self.substeps):
+            step(self.dt/self.substeps)
+        self.ticks += 1
+
+    def update(self, step):
+        # advance() by however much real time passed since the last update
+        now = time.perf_counter()
+        elapsed = 0 if self.lastTime is None else now - self.lastTime
+        self.lastTime = now
+        return self.advance(elapsed, step)
+
+    def reset(self):
+        # forget the time that passed while the game wasn't running (ex: game over)
+        self.accumulator = 0
+        self.lastTime = None
+
+class SpatialHash(MvcExempt):
+    # broadphase for collisions: a uniform grid of cellSize x cellSize cells, where
+    # each object is listed in every cell it touches. query only looks at the cells
+    # around an area, so it costs about the same no matter how many objects there are
+
+    def __init__(self, cellSize):
+        self.cellSize = cellSize
+        self.cells = dict() # (col,row) -> {object: insertion order}
+        self.objectCells = dict() # object -> (cells it's in, insertion order)
+        self.nextOrder = 0
+        self.version = 0 # goes up every time an object is added, moved or removed
+
+        # stats
+        self.queries = self.cellsChecked = self.candidates = 0
+
+    def getCells(self, x0, y0, x1, y1):
+        # every cell the (inclusive) box x0 <= x <= x1, y0 <= y <= y1 touches
+        size = self.cellSize
+        return [(col,row) for col in range(math.floor(x0/size), math.floor(x1/size) + 1)
+                          for row in range(math.floor(y0/size), math.floor(y1/size) + 1)]
+
+    def insert(self, object):
+        cells = self.getCells(*getBox(object))
+        order = self.nextOrder
+        self.nextOrder += 1
+
+        self.objectCells[object] = (cells, order)
+        for cell in cells:
+            self.cells.setdefault(cell, dict())[object] = order
+        self.version += 1
+
+    def remove(self, object):
+        cells, order = self.objectCells.pop(object)
+        for cell in cells:
+            del self.cells[cell][object]
+            if len(self.cells[cell]) == 0:
+                del self.cells[cell]
+        self.version += 1
+
+    def move(self, object, pos):
+        # objects have to be moved through here so their cells stay right
+        self.remove(object)
+        object.setPosition(pos)
+        self.insert(object)
+
+    def clear(self):
+        self.cells.clear()
+        self.objectCells.clear()
+        self.version += 1
+
+    def query(self, x0, y0, x1, y1):
+        # objects in the cells touching the box, in the order they were inserted
+        # (the same order as a plain list, so collisions resolve the same way)
+        found = dict()
+        cells = self.getCells(x0, y0, x1, y1)
+        for cell in cells:
+            found.update(self.cells.get(cell, ()))
+
+        self.queries += 1
+        self.cellsChecked += len(cells)
+        self.candidates += len(found)
+        return sorted(found, key = found.get)
+
+    def getStats(self):
+        queries = max(1, self.queries)
+        return {"objects": len(self.objectCells), "cells": len(self.cells),
+                "queries": self.queries,
+                "cellsPerQuery": self.cellsChecked/queries,
+                "candidatesPerQuery": self.candidates/queries}
+
+class PlatformView:
+    # Object-style access (getPosition, getSize, setPosition) to one slot of a PlatformStore
+    # views belong to the slot, not the platform: once the store reuses that slot for
+    # a new platform, the view shows the new one
+    __slots__ = ("store", "slot")
+
+    def __init__(self, store, slot):
+        self.store = store
+        self.slot = slot
+
+    def getPosition(self):
+        return self.store.xs[self.slot], self.store.ys[self.slot]
+
+    def getSize(self):
+        return self.store.sizes[self.slot]
+
+    def getCollider(self):
+        return self.store.shapes[self.slot]
+
+    def getBox(self):
+        store, slot = self.store, self.slot
+        x, y, size = store.xs[slot], store.ys[slot], store.sizes[slot]
+        return (x, y - size, x + size, y)
+
+    def setPosition(self, pos):
+        # (moving a platform along x can break the store's sorted order)
+        self.store.xs[self.slot], self.store.ys[self.slot] = pos[0], pos[1]
+        self.store.version += 1
+
+class PlatformStore:
+    # compact platform list: x, y and size are kept in parallel arrays in a fixed size
+    # ring buffer instead of one Python object per platform. once it's full, adding a
+    # platform overwrites the oldest one, so nothing gets copied or allocated per platform
+    # platforms have to be added in order of x (like the generated ones), which keeps
+    # the buffer sorted so it can be searched with bisection
+    def __init__(self, capacity = 256):
+        self.capacity = capacity
+        self.xs = array.array("d", [0])*capacity
+        self.ys = array.array("d", [0])*capacity
+        self.sizes = array.array("d", [0])*capacity
+        self.shapes = [None]*capacity # collider of each slot (shared squares)
+        self.start = 0 # slot of the first (leftmost) platform
+        self.count = 0
+        self.views = [PlatformView(self, slot) for slot in range(capacity)]
+        self.maxSize = 0
+        self.version = 0 # goes up every time a platform is added, moved or removed
+
+    def getSlot(self, index):
+        return (self.start + index) % self.capacity
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self.views[self.getSlot(index)]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError("platform index out of range")
+        return self.views[self.getSlot(index)]
+
+    def add(self, x, y, size):
+        if self.count > 0 and x < self.xs[self.getSlot(self.count - 1)]:
+            raise ValueError("platforms have to be added in order of x")
+        if self.count == self.capacity:
+            self.removeFirst(1)
+        slot = self.getSlot(self.count)
+        self.xs[slot], self.ys[slot], self.sizes[slot] = x, y, size
+        self.shapes[slot] = colliders.getSquare(size)
+        self.count += 1
+        self.maxSize = max(self.maxSize, size)
+        self.version += 1
+
+    def append(self, object):
+        # so an Object can be added like with a list (its data is copied in)
+        # (only squares fit in the store, other shapes need a list)
+        collider = object.getCollider()
+        if not colliders.isBox(collider) or collider.width != collider.height:
+            raise ValueError("PlatformStore can only hold square platforms")
+        x,y = object.getPosition()
+        self.add(x, y, collider.width)
+
+    def removeFirst(self, count):
+        count = min(count, self.count)
+        self.start = self.getSlot(count)
+        self.count -= count
+        self.version += 1
+
+    def clear(self):
+        self.start = self.count = 0
+        self.maxSize = 0
+        self.version += 1
+
+    def findFirst(self, x):
+        # index of the first platform with x >= x (binary search, like bisect_left)
+        # (getSlot is written out in these loops since they run every physics step)
+        xs, start, capacity = self.xs, self.start, self.capacity
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high)//2
+            if xs[(start + middle) % capacity] < x:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def queryRange(self, x0, x1):
+        # platforms with x0 <= (some part of the platform) <= x1
+        results = []
+        xs, sizes, start, capacity = self.xs, self.sizes, self.start, self.capacity
+        for index in range(self.findFirst(x0 - self.maxSize), self.count):
+            slot = (start + index) % capacity
+            x = xs[slot]
+            if x > x1:
+                break
+            if x + sizes[slot] >= x0:
+                results.append(self.views[slot])
+        return results
+
+    def query(self, x0, y0, x1, y1):
+        # platforms touching the box (same as SpatialHash.query)
+        results = []
+        for view in self.queryRange(x0, x1):
+            slot = view.slot
+            y = self.ys[slot]
+            if y >= y0 and y - self.sizes[slot] <= y1:
+                results.append(view)
+        return results
+
+def getNearbyObjects(app, x0, y0, x1, y1):
+    # objects that could be touching the box: from app.broadphase if there is one,
+    # or from app.objects itself if it's a PlatformStore
+    # (otherwise it's every object)
+    broadphase = getattr(app, "broadphase", None)
+    if broadphase is not None:
+        return broadphase.query(x0, y0, x1, y1)
+    elif isinstance(app.objects, PlatformStore):
+        return app.objects.query(x0, y0, x1, y1)
+    return app.objects
+
+def getObjectsVersion(app):
+    # something that changes whenever the platforms do (for plain lists, just the length)
+    broadphase = getattr(app, "broadphase", None)
+    if broadphase is not None:
+        version = broadphase.version
+    else:
+        version = getattr(app.objects, "version", len(app.objects))
+    heightfield = getattr(app, "heightfield", None)
+    if heightfield is not None:
+        return version, heightfield.version, heightfield.x0
+    return version
+
+def addObject(app, object):
+    app.objects.append(object)
+    if getattr(app, "broadphase", None) is not None:
+        app.broadphase.insert(object)
+
+# launch preview: where the player will go if the drag is let go now
+#   the path is worked out from formulas instead of stepping the physics: a parabola
+#   while gravity speeds the player up, then a straight line at terminal velocity.
+#   it's split into pieces where y only goes one way, so the time the player's box
+#   reaches a height is one square root, and the first platform hit comes from that
+
+def getTrajectoryPieces(player, vx, vy, seconds, dt = TICK):
+    # pieces (startTime, endTime, y at start, vy at start, ay) covering 0 to seconds
+    # (Player.updatePosition speeds up before moving, which is the same as the
+    # parabola starting half a step of gravity faster)
+    g = player.gravity
+    terminal = player.terminalVelocity
+    x, y = player.getPosition()
+    pieces = []
+    t = 0
+    if vy < terminal:
+        vy = min(vy + g*dt/2, terminal)
+        # falling at terminal velocity from here on
+        tTerminal = min((terminal - vy)/g, seconds)
+        # the top of the arc (where it switches from going up to going down)
+        if vy < 0 and -vy/g < tTerminal:
+            tTop = -vy/g
+            pieces.append((0, tTop, y, vy, g))
+            y += vy*tTop + g*tTop**2/2
+            t, vy = tTop, 0
+        pieces.append((t, tTerminal, y, vy, g))
+        y += vy*(tTerminal - t) + g*(tTerminal - t)**2/2
+        t, vy = tTerminal, min(vy + g*(tTerminal - t), terminal)
+    if t < seconds:
+        pieces.append((t, seconds, y, vy, 0))
+    return pieces
+
+def getPieceY(piece, t):
+    t0, t1, y0, vy, ay = piece
+    return y0 + vy*(t - t0) + ay*(t - t0)**2/2
+
+def getPieceTime(piece, y):
+    # when the piece reaches height y (it only goes one way so there's just one time),
+    # or None if it doesn't
+    t0, t1, y0, vy, ay = piece
+    yEnd = getPieceY(piece, t1)
+    if not (min(y0, yEnd) <= y <= max(y0, yEnd)):
+        return None
+    if ay == 0:
+        return t0 if vy == 0 else t0 + (y - y0)/vy
+    # y0 + vy*s + ay*s^2/2 = y, taking the root that's inside the piece
+    root = max(0, vy**2 + 2*ay*(y - y0))**0.5
+    s = (-vy + root)/ay if vy >= 0 else (-vy - root)/ay
+    return t0 + min(max(s, 0), t1 - t0)
+
+def getContactTime(pieces, x0, vx, size, box):
+    # first time the player (a size x size box with its bottom left at x0 + vx*t, y(t))
+    # overlaps box, or None
+    left, top, right, bottom = box
+    # x overlaps for a single stretch of time (vx doesn't change)
+    if vx == 0:
+        if x0 + size <= left or x0 >= right:
+            return None
+        xStart, xEnd = -math.inf, math.inf
+    else:
+        xStart, xEnd = sorted(((left - size - x0)/vx, (right - x0)/vx))
+
+    for piece in pieces:
+        t0, t1 = piece[0], piece[1]
+        start, end = max(t0, xStart), min(t1, xEnd)
+        if start >= end:
+            continue
+        # y overlaps while the bottom of the player is between the top of the box
+        # and the bottom of the box + size, which is also one stretch on each piece
+        yStart, yEnd = getPieceY(piece, start), getPieceY(piece, end)
+        if piece[3] >= 0: # going down
+            if yEnd <= top or yStart >= bottom + size:
+                continue
+            if yStart <= top:
+                start = getPieceTime(piece, top)
+        else:
+            if yStart <= top or yEnd >= bottom + size:
+                continue
+            if yStart >= bottom + size:
+                start = getPieceTime(piece, bottom + size)
+        if start is not None and start > 0:
+            return start
+    return None
+
+class TrajectoryPreview:
+    # the predicted path for app.vector, only recomputed once the drag (or the player)
+    # moves more than threshold pixels. the platforms near the path are kept until the
+    # player moves away or new ones get made
+    def __init__(self, seconds = 3, threshold = 3, samples = 40):
+        self.seconds = seconds
+        self.threshold = threshold
+        self.samples = samples
+        self.boxes = []
+        self.boxRange = None
+        self.boxVersion = None
+        self.clear()
+
+    def clear(self):
+        self.points = [] # (x, y) of the middle of the player along the path
+        self.contact = None # time of the first platform hit
+        self.lastKey = None
+
+    def getBoxes(self, app, x0, y0, x1, y1):
+        # platform boxes touching x0 <= x <= x1, y0 <= y <= y1 (cached for a bit bigger
+        # area than that, until the platforms change)
+        version = getObjectsVersion(app)
+        if (self.boxRange is None or version != self.boxVersion or
+            x0 < self.boxRange[0] or y0 < self.boxRange[1] or
+            x1 > self.boxRange[2] or y1 > self.boxRange[3]):
+            xMargin, yMargin = (x1 - x0)/2, (y1 - y0)/2
+            self.boxRange = (x0 - xMargin, y0 - yMargin, x1 + xMargin, y1 + yMargin)
+            self.boxVersion = version
+            self.boxes = [getBox(object) for object in getNearbyObjects(app, *self.boxRange)]
+        return self.boxes
+
+    def update(self, app):
+        if app.vector is None or len(app.vector) < 4:
+            self.clear()
+            return
+        player = app.player
+        x, y = player.getPosition()
+        x1, y1, x2, y2 = app.vector
+        key = (x1 - x2, y1 - y2, x, y)
+        if (self.lastKey is not None and
+            max(abs(a - b) for a, b in zip(key, self.lastKey)) < self.threshold):
+            return
+        self.lastKey = key
+
+        # same as updateVelocity
+        vx0, vy0 = player.getVelocity()
+        vx = vx0 + (x1 - x2) * 2
+        vy = vy0 + (y1 - y2) * 10/3
+        seconds = self.seconds
+        pieces = getTrajectoryPieces(player, vx, vy, seconds)
+        size = player.getSize()
+
+        # every piece only goes one way, so the path's highest and lowest points are
+        # at the ends of pieces
+        ys = [getPieceY(piece, t) for piece in pieces for t in piece[:2]]
+        boxes = self.getBoxes(app, min(x, x + vx*seconds) - size, min(ys) - size,
+                              max(x, x + vx*seconds) + size, max(ys) + size)
+        contact = None
+        for box in boxes:
+            t = getContactTime(pieces, x, vx, size, box)
+            if t is not None and (contact is None or t < contact):
+                contact = t
+        self.contact = contact
+        end = seconds if contact is None else contact
+
+        self.points = []
+        piece = 0
+        for i in range(self.samples + 1):
+            t = end*i/self.samples
+            while pieces[piece][1] < t and piece < len(pieces) - 1:
+                piece += 1
+            self.points.append((x + vx*t + size/2, getPieceY(pieces[piece], t) - size/2))
+
+def updatePreview(app):
+    preview = getattr(app, "preview", None)
+    if preview is not None:
+        preview.update(app)
+
 def timerFired(app): 
-    app.player.updatePosition(app)
+    app.clock.update(lambda dt: app.player.updatePosition(app, dt))
 
 def appStarted(app):
     app.startingPosition = 50,300
     app.player = Player(app.startingPosition,50)
     app.margin = 10
     app.timerDelay = 10
+    app.clock = FixedTimestep()
     app.blockSize = 50 # defualt platform size
     app.vector = None # contains [x1,y1,x2,y2] values of the player-drawn launch vector
+    app.preview = TrajectoryPreview()
     app.objects = [] # list of objects the player can interact with
+    app.broadphase = SpatialHash(app.blockSize)
     createTestPlatforms(app)
+    createTestShapes(app)
+    createTestTerrain(app)
 
 # two example levels for debugging
 def createWalls(app):
     width = app.width // app.blockSize
     height = app.height // app.blockSize
     for n in range(width):
-        app.objects.append(Object(app.blockSize*n,app.height,app.blockSize))
+        addObject(app, Object(app.blockSize*n,app.height,app.blockSize))
     for n in range(height):
-        app.objects.append(Object(app.width - app.blockSize,app.height - app.blockSize*n,app.blockSize))
+        addObject(app, Object(app.width - app.blockSize,app.height - app.blockSize*n,app.blockSize))
 
 def createTestPlatforms(app):
-    app.objects.append(Object(50,app.height,app.blockSize))
-    app.objects.append(Object(150,300,app.blockSize))
-    app.objects.append(Object(400,350,app.blockSize))
+    addObject(app, Object(50,app.height,app.blockSize))
+    addObject(app, Object(150,300,app.blockSize))
+    addObject(app, Object(400,350,app.blockSize))
+
+def createTestShapes(app):
+    # a ramp and a round bumper, for trying out the other colliders
+    ramp = colliders.PolygonCollider([(0, 0), (150, 0), (150, -75)])
+    addObject(app, Object(200, app.height, 150, ramp))
+    addObject(app, Object(300, 200, 60, colliders.CircleCollider(30)))
+
+def createTestTerrain(app):
+    # rolling hills along the bottom, as a heightfield instead of objects
+    spacing = 10
+    heights = [app.height - 30 + 20*math.sin(col*spacing/60)
+               for col in range(app.width//spacing)]
+    app.heightfield = colliders.Heightfield(heights, spacing)
 
 # functions for clicking and dragging on the block 
 #   (seperate functions for the sake of running in other files)
@@ -232,6 +900,7 @@ def updateVector(app,event, scroll = 0):
         app.vector.extend([0,0])
     app.vector[2] = event.x
     app.vector[3] = event.y
+    updatePreview(app)
 
 def stopVector(app,event, scroll = 0):
     app.isDrawing = False
@@ -243,6 +912,7 @@ def stopVector(app,event, scroll = 0):
     app.vector[3] = event.y
 
     app.player.updateVelocity(app)
+    updatePreview(app)
 
 def mousePressed(app,event):
     startVector(app,event)
@@ -261,24 +931,35 @@ def keyPressed(app,event):
 
 
 # drawing functions
-def drawVector(app,canvas):
-    # draws green launch vector
+def drawVector(app,canvas,scroll = 0):
+    # draws green launch vector, and the path it would launch the player on
     if app.vector is not None and len(app.vector) == 4:
         x1,y1,x2,y2 = app.vector
         canvas.create_line(x1,y1,x2,y2,fill = "green", width = 5)
+        preview = getattr(app, "preview", None)
+        if preview is not None and len(preview.points) > 1:
+            points = [(x - scroll, y) for x, y in preview.points]
+            canvas.create_line(points, fill = "white", width = 2, dash = (4,4))
 
 def drawObjects(app,canvas,scroll = 0, image = None):
-    # draws all platforms
-    for object in app.objects:
+    # draws all platforms (just the ones on screen if app.objects can be searched)
+    objects = app.objects
+    if isinstance(objects, PlatformStore):
+        objects = objects.queryRange(scroll, scroll + app.width)
+    for object in objects:
         x,y = object.getPosition()
         x -= scroll
         size = object.getSize()
-        if image:
-            canvas.create_image(x + size/2, y - size/2, image=ImageTk.PhotoImage(image))
+        collider = object.getCollider()
+        if not colliders.isBox(collider):
+            colliders.drawCollider(canvas, collider, x, y, fill = "", outline = "black")
+        elif image:
+            canvas.create_image(x + size/2, y - size/2, pilImage=image)
         else:
             canvas.create_rectangle(x, y, x + size, y - size)
 
 def redrawAll(app, canvas):
+    colliders.drawHeightfield(canvas, app.heightfield, 0, app.height, fill = "tan")
     drawObjects(app,canvas)
     app.player.drawPlayer(canvas)
     drawVector(app,canvas)
@@ -0,0 +1,147 @@
+# input recording and playback
+# a replay is the seed plus every mouse/key event, tagged with the physics tick it
+# happened on. since the terrain only depends on the seed and the physics runs at a
+# fixed rate, feeding the same events in on the same ticks gives the same game
+
+#   python replay.py replays/<some replay>.ngr
+
+import os
+import sys
+import time
+import struct
+
+REPLAY_MAGIC = b"NGRP"
+REPLAY_VERSION = 3 # 2: the player sleeps on platforms, 3: dying in the actual water
+# magic, version, seed
+REPLAY_HEADER = struct.Struct("<4sHQ")
+# tick, event type, x (or the key), y, scroll (13 bytes an event)
+REPLAY_EVENT = struct.Struct("<IBhhf")
+
+MOUSE_PRESSED = 0
+MOUSE_DRAGGED = 1
+MOUSE_RELEASED = 2
+KEY_PRESSED = 3
+
+REPLAY_FOLDER = "replays"
+
+class ReplayRecorder:
+    # appends events to a replay file as they happen
+
+    def __init__(self, path, seed):
+        self.path = path
+        self.events = 0
+        self.file = open(path, "wb")
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed))
+        self.file.flush()
+
+    @staticmethod
+    def startSession(seed, folder = REPLAY_FOLDER):
+        # new replay file named after the time and seed
+        os.makedirs(folder, exist_ok = True)
+        name = time.strftime("%Y%m%d-%H%M%S") + f"-{seed}.ngr"
+        return ReplayRecorder(os.path.join(folder, name), seed)
+
+    def record(self, tick, kind, x, y, scroll):
+        if self.file is None:
+            return
+        # int16 is plenty for window coordinates (and clamping beats crashing)
+        x = min(max(int(x), -32768), 32767)
+        y = min(max(int(y), -32768), 32767)
+        self.file.write(REPLAY_EVENT.pack(tick, kind, x, y, scroll))
+        # flushed every time so a crash still leaves the replay behind
+        self.file.flush()
+        self.events += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def record(app, kind, event):
+    # called from the event handlers in main.py, before the event does anything
+    if getattr(app, "recorder", None) is None:
+        return
+    if kind == KEY_PRESSED:
+        # only single characters do anything in the game
+        if len(event.key) != 1:
+            return
+        x, y = ord(event.key), 0
+    else:
+        x, y = event.x, event.y
+    app.recorder.record(app.clock.ticks, kind, x, y, app.scroll)
+
+class ReplayEvent:
+    # looks enough like a tkinter event for the handlers in main.py
+    def __init__(self, tick, kind, x, y, scroll):
+        self.tick, self.kind, self.scroll = tick, kind, scroll
+        if kind == KEY_PRESSED:
+            self.x = self.y = 0
+            self.key = chr(x)
+        else:
+            self.x, self.y = x, y
+            self.key = None
+
+def loadReplay(path):
+    # returns (seed, list of ReplayEvents)
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < REPLAY_HEADER.size:
+        raise ValueError(f"{path} is too short to be a replay")
+    magic, version, seed = REPLAY_HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError(f"{path} is not a (version {REPLAY_VERSION}) replay")
+    body = data[REPLAY_HEADER.size:]
+    # a half written event at the end (from a crash) is ignored
+    usable = len(body) - len(body) % REPLAY_EVENT.size
+    events = [ReplayEvent(*values) for values in REPLAY_EVENT.iter_unpack(body[:usable])]
+    return seed, events
+
+HANDLERS = {MOUSE_PRESSED: "mousePressed", MOUSE_DRAGGED: "mouseDragged",
+            MOUSE_RELEASED: "mouseReleased", KEY_PRESSED: "keyPressed"}
+
+def playReplay(path, extraTicks = 1000):
+    # runs the replay headlessly (as fast as it can), then extraTicks more ticks
+    # to see where the last launch ends up. returns the app and some stats
+    import main
+    import headless
+
+    seed, events = loadReplay(path)
+    app = headless.createGame(seed)
+    start = time.perf_counter()
+    for event in events:
+        # catch up to the tick the event happened on (no ticks pass while dead)
+        while not app.gameOver and app.clock.ticks < event.tick:
+            headless.tick(app)
+        if app.gameOver:
+            # the game keeps counting a few ticks in the frame it ended on
+            app.clock.ticks = event.tick
+        # scroll is put back too since it decides if a click hit the player
+        app.scroll = event.scroll
+        getattr(main, HANDLERS[event.kind])(app, event)
+    for _ in range(extraTicks):
+        if app.gameOver:
+            break
+        headless.tick(app)
+    seconds = time.perf_counter() - start
+    main.appStopped(app)
+
+    stats = {"seed": seed, "events": len(events), "ticks": app.clock.ticks,
+             "seconds": seconds, "speedup": app.clock.ticks * app.clock.dt / max(seconds, 1e-9),
+             "score": app.score, "gameOver": app.gameOver,
+             "position": app.player.getPosition()}
+    return app, stats
+
+def main_(args = None):
+    args = sys.argv[1:] if args is None else args
+    if len(args) != 1:
+        print("usage: python replay.py <replay file>")
+        return None
+    app, stats = playReplay(args[0])
+    print(f"seed {stats['seed']}: {stats['events']} events, {stats['ticks']} ticks "
+          f"in {stats['seconds']:.2f}s ({stats['speedup']:.0f}x real time)")
+    print(f"score {stats['score']}, position {stats['position']}"
+          + (" (dead)" if stats["gameOver"] else ""))
+    return stats
+
+if __name__ == "__main__":
+    main_()
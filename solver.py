@@ -0,0 +1,207 @@
+# launch solver: tries lots of launches (drags) at once to find ones that land on a platform
+#   used for the aim hint in the game (press h) and for the playtester below
+#   the candidates are split between processes (one per core) and each process
+#   steps its share together with batchsim. every search has a deadline the workers
+#   check as they go, so a search that runs out of time doesn't keep the pool busy
+#   for the next one
+
+#   python solver.py --seed 1 --shots 10
+
+import os
+import copy
+import time
+import math
+import argparse
+import threading
+import multiprocessing
+import concurrent.futures
+from cmu_112_graphics import MvcExempt
+import physics
+import batchsim
+
+# one pool for the whole program, since starting processes is slow
+# (spawned, not forked, since the game has threads running by the time it starts)
+pool = None
+
+def getPool(workers = None):
+    global pool
+    if pool is None:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers = workers or os.cpu_count(),
+                    mp_context = multiprocessing.get_context("spawn"))
+    return pool
+
+def waitForPool(workers = None):
+    # starts the worker processes if they aren't running yet and waits for them
+    # (starting them takes a while, so it's done before a search's budget starts)
+    count = workers or os.cpu_count()
+    concurrent.futures.wait([getPool(workers).submit(os.getpid) for _ in range(count)])
+
+def stopPool():
+    global pool
+    if pool is not None:
+        pool.shutdown(cancel_futures = True)
+        pool = None
+
+def getDrags(maxDrag, count):
+    # count x count grid of drags (x1-x2, y1-y2), forwards and upwards only
+    # (Player.updateVelocity only cares about the difference)
+    step = maxDrag/(count - 1)
+    return [(i*step, -j*step) for i in range(count) for j in range(count)]
+
+def simulateDrags(player, platforms, drags, steps, deadline = None, stepsPerCheck = 50):
+    # runs in a worker: launches a copy of player with every drag and returns
+    # where each one is after steps ticks
+    # (platforms are (x, y, size) tuples since those are quick to send between processes)
+    # gives up and returns None once time.time() passes deadline
+    if deadline is not None and time.time() > deadline:
+        return None
+    platforms = [physics.Object(x, y, size) for x, y, size in platforms]
+    vx, vy = player.getVelocity()
+    velocities = [(vx + dx*2, vy + dy*10/3) for dx, dy in drags]
+    batch = batchsim.PlayerBatch(player, [player.getPosition()]*len(drags), velocities)
+    for done in range(0, steps, stepsPerCheck):
+        batch.run(platforms, min(stepsPerCheck, steps - done))
+        if deadline is not None and time.time() > deadline:
+            return None
+    return batch.getPositions()
+
+def findTarget(player, platforms):
+    # the first platform entirely ahead of the player
+    x, y = player.getPosition()
+    ahead = [platform for platform in platforms if platform[0] > x + player.getSize()]
+    if len(ahead) == 0:
+        return None
+    return min(ahead)
+
+def isOnTop(player, position, platform):
+    # if the player at position is standing on platform
+    x, y = position
+    px, py, size = platform
+    return (abs(y - (py - size)) < 1 and
+            x + player.getSize() > px and x < px + size)
+
+def findShots(player, platforms, target = None, maxDrag = 300, count = 32,
+              seconds = 3, budget = 0.5, workers = None, best = 5):
+    # searches drags for launches that end up standing on target (by default the next
+    # platform), giving up on whatever isn't done after budget seconds (the workers
+    # stop on their own then too, and anything they finish late is ignored)
+    # returns up to best shots, closest to the middle of the platform first, as dicts of
+    # drag (x1-x2, y1-y2) and landing position
+    # workers = 0 runs everything in this process
+    start = time.perf_counter()
+    platforms = [(*platform.getPosition(), platform.getSize()) for platform in platforms]
+    if target is None:
+        target = findTarget(player, platforms)
+        if target is None:
+            return []
+
+    drags = getDrags(maxDrag, count)
+    steps = round(seconds/physics.TICK)
+    if workers == 0:
+        results = [(drags, simulateDrags(player, platforms, drags, steps))]
+    else:
+        # every chunk gets an even spread of drags, so running out of time
+        # leaves gaps everywhere instead of missing a whole corner
+        chunks = (workers or os.cpu_count())*4
+        remaining = max(0, budget - (time.perf_counter() - start))
+        deadline = time.time() + remaining
+        futures = dict()
+        for i in range(chunks):
+            chunk = drags[i::chunks]
+            future = getPool(workers).submit(simulateDrags, player, platforms, chunk,
+                                             steps, deadline)
+            futures[future] = chunk
+        done, notDone = concurrent.futures.wait(futures, timeout = remaining)
+        for future in notDone:
+            future.cancel()
+        results = [(futures[future], future.result()) for future in done
+                   if future.result() is not None]
+
+    shots = []
+    middle = target[0] + target[2]/2 - player.getSize()/2
+    for chunk, positions in results:
+        for drag, position in zip(chunk, positions):
+            if isOnTop(player, position, target):
+                shots.append({"drag": drag, "landing": position,
+                              "miss": abs(position[0] - middle)})
+    # closest to the middle, then the shortest drag
+    shots.sort(key = lambda shot: (round(shot["miss"]), math.hypot(*shot["drag"])))
+    return shots[:best]
+
+class ShotSearch(MvcExempt):
+    # findShots on a thread, so the game keeps running while it searches
+    # (the player and platforms are copied first since the game keeps changing them)
+    def __init__(self, player, platforms, **options):
+        player = copy.copy(player)
+        platforms = [physics.Object(*platform.getPosition(), platform.getSize())
+                     for platform in platforms]
+        self.shots = None
+        self.finished = threading.Event()
+        self.thread = threading.Thread(target = self.run, args = (player, platforms, options),
+                                       daemon = True)
+        self.thread.start()
+
+    def run(self, player, platforms, options):
+        try:
+            waitForPool(options.get("workers"))
+            self.shots = findShots(player, platforms, **options)
+        except Exception:
+            self.shots = [] # (ex: the pool was shut down while quitting)
+        self.finished.set()
+
+    def isDone(self):
+        return self.finished.is_set()
+
+def getVector(player, drag, scroll = 0):
+    # app.vector (x1, y1, x2, y2) for a drag, starting from the middle of the player
+    x, y = player.getPosition()
+    size = player.getSize()
+    x1, y1 = x + size/2 - scroll, y - size/2
+    return [x1, y1, x1 - drag[0], y1 - drag[1]]
+
+def waitUntilResting(app, ticks = 20, maxWait = 1000):
+    # steps the game until the player has moved less than a pixel in the last ticks ticks
+    import headless
+    last = app.player.getPosition()
+    still = 0
+    for _ in range(maxWait):
+        if app.gameOver or still >= ticks:
+            return
+        headless.tick(app)
+        x, y = app.player.getPosition()
+        if math.hypot(x - last[0], y - last[1]) < 1:
+            still += 1
+        else:
+            last, still = (x, y), 0
+
+def playtest(seed = None, shots = 10, budget = 0.5, workers = None, maxWait = 1000):
+    # plays the game headlessly, using the solver for every launch
+    import main
+    import headless
+
+    app = headless.createGame(seed)
+    taken = 0
+    for shot in range(shots):
+        waitUntilResting(app, maxWait = maxWait)
+        if app.gameOver:
+            break
+        platforms = app.objects.queryRange(app.scroll, app.scroll + 3*app.width)
+        found = findShots(app.player, platforms, budget = budget, workers = workers)
+        if len(found) == 0:
+            print(f"shot {shot}: nothing found")
+            break
+        headless.launch(app, getVector(app.player, found[0]["drag"], app.scroll))
+        taken += 1
+        print(f"shot {shot}: drag {found[0]['drag']} -> {found[0]['landing']}")
+    main.appStopped(app)
+    return {"seed": app.seed, "shots": taken, "score": app.score, "gameOver": app.gameOver}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "play the game with the launch solver")
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--shots", type = int, default = 10)
+    parser.add_argument("--budget", type = float, default = 0.5)
+    parser.add_argument("--workers", type = int, default = None)
+    options = parser.parse_args()
+    print(playtest(options.seed, options.shots, options.budget, options.workers))
+    stopPool()